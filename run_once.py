@@ -5,20 +5,35 @@ import sqlite3
 from pathlib import Path
 
 from scraper.job import SelectorValidationError, run_once
+from scraper.storage import SQLITE_MMAP_SIZE
 
 
-def _count_rows(database_path: str) -> dict:
+def _count_rows(database_path: str, approximate: bool = False) -> dict:
+    """
+    Return row counts for the stations and readings tables.
+
+    With `approximate`, MAX(rowid) is used instead of COUNT(*): it is read from
+    the edge of the B-tree and matches the count while rows are only appended.
+    """
     if not Path(database_path).exists():
         return {"stations": 0, "readings": 0}
-    with sqlite3.connect(database_path) as conn:
-        cursor = conn.cursor()
-        counts = {}
-        for table in ("stations", "readings"):
-            try:
-                cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                counts[table] = cursor.fetchone()[0]
-            except sqlite3.OperationalError:
-                counts[table] = 0
+    aggregate = "MAX(rowid)" if approximate else "COUNT(*)"
+    # Read-only connection: the scraper's engine already switched the file to
+    # WAL. immutable=1 is avoided because it would ignore un-checkpointed WAL
+    # frames written by the run that just finished.
+    database_uri = Path(database_path).resolve().as_uri() + "?mode=ro"
+    with sqlite3.connect(database_uri, uri=True) as conn:
+        conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        # Only count tables that exist, so a fresh database needs no exception path.
+        existing = {
+            name
+            for (name,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name IN ('stations', 'readings')"
+            )
+        }
+        counts = {"stations": 0, "readings": 0}
+        for table in existing:
+            counts[table] = conn.execute(f"SELECT {aggregate} FROM {table}").fetchone()[0] or 0
         return counts
 
 
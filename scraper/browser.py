@@ -1,16 +1,20 @@
 """
 Playwright utilities used by the scraping job.
 
-The functions here wrap common tasks such as launching a browser session,
-navigating into nested iframes, and triggering pagination behavior. The
-actual selectors come from `selectors.py`.
+The functions here wrap common tasks such as keeping a warm pool of browser
+contexts, navigating into nested iframes, and triggering pagination behavior.
+The actual selectors come from `selectors.py`.
 """
 
 from __future__ import annotations
 
+import atexit
+import os
+import time
+import weakref
 from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Optional, Union
+from typing import Callable, FrozenSet, Iterator, List, Optional, Sequence, Tuple, Union
 
 from playwright.sync_api import (
     Browser,
@@ -18,96 +22,290 @@ from playwright.sync_api import (
     Error as PlaywrightError,
     Frame,
     Page,
+    Playwright,
+    Request,
+    Route,
     TimeoutError as PlaywrightTimeout,
     sync_playwright,
 )
 
 from .selectors import PageSelectors, ScrollSettings
 
+# 检测系统级 Chromium 路径（Linux 服务器用），每个进程只检测一次
+_SYSTEM_CHROMIUM_PATHS = (
+    "/usr/bin/chromium",
+    "/usr/bin/chromium-browser",
+    "/usr/bin/google-chrome",
+    "/usr/bin/google-chrome-stable",
+)
+_SYSTEM_CHROMIUM: Optional[str] = next((path for path in _SYSTEM_CHROMIUM_PATHS if os.path.exists(path)), None)
+
+# 使用 "new" headless 模式，更难被网站检测
+_LAUNCH_ARGS: Tuple[str, ...] = (
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-software-rasterizer",
+    "--disable-blink-features=AutomationControlled",  # 隐藏自动化标识
+)
+
+# 注入脚本隐藏 webdriver 属性
+_INIT_SCRIPT = "Object.defineProperty(navigator, 'webdriver', {get: () => undefined});"
+
+
+# Playwright driver process shared by every pool in this process.
+_PW_INSTANCE: Optional[Playwright] = None
+
+
+def _get_pw() -> Playwright:
+    """Start the Playwright driver on first use and reuse it afterwards."""
+    global _PW_INSTANCE
+    if _PW_INSTANCE is None:
+        _PW_INSTANCE = sync_playwright().start()
+    return _PW_INSTANCE
+
+
+def _stop_pw() -> None:
+    global _PW_INSTANCE
+    if _PW_INSTANCE is not None:
+        _PW_INSTANCE.stop()
+        _PW_INSTANCE = None
+
+
+# Pools still alive at exit; weak so a dropped pool is not kept around.
+_LIVE_POOLS: "weakref.WeakSet[BrowserPool]" = weakref.WeakSet()
+
+
+def _shutdown_live_pools() -> None:
+    for pool in list(_LIVE_POOLS):
+        pool.shutdown()
+
+
+# atexit runs hooks in reverse order: pools are shut down before the driver stops.
+atexit.register(_stop_pw)
+atexit.register(_shutdown_live_pools)
+
 
 @dataclass
 class BrowserConfig:
     headless: bool = True
     timeout_ms: int = 15_000
+    # Playwright resource types aborted before download; the scraper only
+    # needs documents, scripts and XHR responses.
+    block_resources: FrozenSet[str] = frozenset({"image", "media", "font"})
 
 
-@contextmanager
-def browser_page(config: BrowserConfig) -> Page:
+@dataclass
+class PooledContext:
+    context: BrowserContext
+    last_used: float
+    in_use: bool = False
+
+
+class BrowserPool:
     """
-    Context manager yielding a single Playwright page.
+    Keep one launched browser and a few warm contexts across scrape runs.
 
-    Closes all resources automatically, even if an exception bubbles up.
+    Contexts are created with the user agent, viewport and init script applied
+    once, handed out by `acquire`, and returned to the pool afterwards instead
+    of being closed. Contexts left idle for longer than `idle_ttl` seconds are
+    closed on the next `acquire`.
     """
-    playwright = sync_playwright().start()
-    browser: Optional[Browser] = None
-    context: Optional[BrowserContext] = None
-    try:
-        # 使用 "new" headless 模式，更难被网站检测
-        launch_args = [
-            "--no-sandbox",
-            "--disable-dev-shm-usage",
-            "--disable-gpu",
-            "--disable-extensions",
-            "--disable-software-rasterizer",
-            "--disable-blink-features=AutomationControlled",  # 隐藏自动化标识
-        ]
-        
-        # 检测系统级 Chromium 路径（Linux 服务器用）
-        import os
-        import shutil
-        executable_path = None
-        system_chromium_paths = [
-            "/usr/bin/chromium",
-            "/usr/bin/chromium-browser",
-            "/usr/bin/google-chrome",
-            "/usr/bin/google-chrome-stable",
-        ]
-        for path in system_chromium_paths:
-            if os.path.exists(path):
-                executable_path = path
+
+    def __init__(self, config: BrowserConfig, max_size: int = 3, idle_ttl: float = 300.0):
+        self.config = config
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.pool: List[PooledContext] = []
+        self._browser: Optional[Browser] = None
+        _LIVE_POOLS.add(self)
+
+    def acquire(self) -> Tuple[BrowserContext, Callable[[], None]]:
+        """Return an idle context (launching one if needed) and its release callback."""
+        self._ensure_browser()
+        self._evict_idle()
+        for item in self.pool:
+            if not item.in_use:
                 break
-        
-        browser = playwright.chromium.launch(
-            headless=config.headless,
-            args=launch_args,
-            executable_path=executable_path,  # None 时使用 Playwright 自带的
+        else:
+            if len(self.pool) >= self.max_size:
+                raise RuntimeError(f"Browser pool exhausted (max_size={self.max_size})")
+            item = self._new_context()
+            self.pool.append(item)
+
+        item.in_use = True
+
+        def release() -> None:
+            item.in_use = False
+            item.last_used = time.monotonic()
+
+        return item.context, release
+
+    def warm_up(self, count: int) -> None:
+        """Preload up to `count` idle contexts so the first acquires skip the launch."""
+        self._ensure_browser()
+        while len(self.pool) < min(count, self.max_size):
+            self.pool.append(self._new_context())
+
+    def shutdown(self) -> None:
+        """Close every pooled context and the browser; the shared driver keeps running."""
+        for item in self.pool:
+            try:
+                item.context.close()
+            except PlaywrightError:
+                pass
+        self.pool.clear()
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except PlaywrightError:
+                pass
+            self._browser = None
+
+    def _ensure_browser(self) -> Browser:
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+
+        # Contexts of a crashed or closed browser cannot be reused.
+        self.pool.clear()
+        self._browser = _get_pw().chromium.launch(
+            headless=self.config.headless,
+            args=_LAUNCH_ARGS,
+            executable_path=_SYSTEM_CHROMIUM,  # None 时使用 Playwright 自带的
         )
-        
+        return self._browser
+
+    def _new_context(self) -> PooledContext:
         # 模拟真实浏览器环境
-        context = browser.new_context(
+        context = self._ensure_browser().new_context(
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             viewport={"width": 1920, "height": 1080},
             locale="zh-CN",
             timezone_id="Asia/Shanghai",
         )
-        
-        # 注入脚本隐藏 webdriver 属性
-        context.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-        """)
-        
+
+        context.add_init_script(_INIT_SCRIPT)
+
+        blocked = self.config.block_resources
+        if blocked:
+
+            def _block(route: Route, request: Request) -> None:
+                if request.resource_type in blocked:
+                    route.abort()
+                else:
+                    route.continue_()
+
+            context.route("**/*", _block)
+        return PooledContext(context=context, last_used=time.monotonic())
+
+    def _evict_idle(self) -> None:
+        now = time.monotonic()
+        keep: List[PooledContext] = []
+        for item in self.pool:
+            if not item.in_use and now - item.last_used > self.idle_ttl:
+                try:
+                    item.context.close()
+                except PlaywrightError:
+                    pass
+            else:
+                keep.append(item)
+        self.pool = keep
+
+
+@contextmanager
+def pooled_page(pool: BrowserPool) -> Iterator[Page]:
+    """
+    Context manager yielding a fresh page from a pooled browser context.
+
+    The page is closed on exit and its context goes back to the pool, even if
+    an exception bubbles up.
+    """
+    context, release = pool.acquire()
+    try:
         page = context.new_page()
-        page.set_default_timeout(config.timeout_ms)
-        yield page
+        page.set_default_timeout(pool.config.timeout_ms)
+        try:
+            yield page
+        finally:
+            try:
+                page.close()
+            except PlaywrightError:
+                pass
     finally:
-        if context is not None:
-            context.close()
-        if browser is not None:
-            browser.close()
-        playwright.stop()
+        release()
 
 
-def navigate_to_table(page: Page, config: PageSelectors) -> Union[Page, Frame]:
+# Walks the iframe chain from the top document in one evaluation. Resolves to
+# the innermost document URL once every frame has loaded, or to a null URL
+# when a frame is cross-origin and cannot be walked from the page.
+_IFRAME_CHAIN_JS = """
+    (chain) => {
+        let doc = document;
+        for (const selector of chain) {
+            const frame = doc.querySelector(selector);
+            if (!frame) {
+                return false;
+            }
+            if (!frame.contentDocument) {
+                return { url: null };
+            }
+            doc = frame.contentDocument;
+        }
+        if (doc.readyState === "loading" || doc.URL === "about:blank") {
+            return false;
+        }
+        return { url: doc.URL };
+    }
+"""
+
+
+def navigate_to_table(
+    page: Page, config: PageSelectors, timeout_ms: float = BrowserConfig.timeout_ms
+) -> Union[Page, Frame]:
     """
     Navigate to the page URL, optionally drilling into nested iframes.
 
-    Returns the page or frame that contains the table selectors.
+    Returns the page or frame that contains the table selectors. Locating
+    the iframes shares one `timeout_ms` budget between the in-page probe and
+    the per-selector fallback.
     """
     page.goto(config.url)
+    if not config.iframe_chain:
+        return page
+
+    deadline = time.monotonic() + timeout_ms / 1000
+    frame = _resolve_iframe_chain(page, config.iframe_chain, timeout_ms)
+    if frame is not None:
+        return frame
+    # 探测未用完的时间留给逐级查找，缺失的 iframe 不会等两遍超时
+    remaining_ms = max(1.0, (deadline - time.monotonic()) * 1000)
+    return _walk_iframe_chain(page, config.iframe_chain, remaining_ms)
+
+
+def _resolve_iframe_chain(page: Page, iframe_chain: Sequence[str], timeout_ms: float) -> Optional[Frame]:
+    """Locate the innermost frame with a single in-page traversal, or None."""
+    try:
+        handle = page.wait_for_function(_IFRAME_CHAIN_JS, arg=list(iframe_chain), timeout=timeout_ms)
+        result = handle.json_value()
+    except PlaywrightError:
+        return None
 
+    url = result.get("url") if isinstance(result, dict) else None
+    if not url:
+        return None
+    matches = [frame for frame in page.frames if frame.url == url]
+    if len(matches) != 1:
+        return None
+    return matches[0]
+
+
+def _walk_iframe_chain(page: Page, iframe_chain: Sequence[str], timeout_ms: float) -> Union[Page, Frame]:
+    deadline = time.monotonic() + timeout_ms / 1000
     current: Union[Page, Frame] = page
-    for selector in config.iframe_chain:
-        frame_element = current.wait_for_selector(selector)
+    for selector in iframe_chain:
+        remaining_ms = max(1.0, (deadline - time.monotonic()) * 1000)
+        frame_element = current.wait_for_selector(selector, timeout=remaining_ms)
         if frame_element is None:
             raise PlaywrightError(f"Iframe selector not found: {selector}")
         current_frame = frame_element.content_frame()
@@ -130,58 +328,90 @@ def perform_scroll(target: Union[Page, Frame], scroll: ScrollSettings) -> None:
         raise ValueError(f"Unsupported scroll mode: {scroll.mode}")
 
 
+# Scrolls the container inside the page until its height and the row count
+# stay unchanged for several rounds, so each round costs no CDP round-trips.
+# The per-round wait adapts: it halves while new rows arrive quickly and
+# doubles back to `waitMs` on a stall; only full-length stalled rounds count
+# towards the stop condition.
+_INFINITE_SCROLL_JS = """
+    async ({ selector, rowSelector, waitMs, maxIter }) => {
+        // Fall back to top-level page scroll when the container is missing.
+        const el = document.querySelector(selector) || document.scrollingElement || document.body;
+        const sample = () => [el.scrollHeight, document.querySelectorAll(rowSelector).length];
+        // Resolves with the elapsed ms once height or rows differ from `before`, or null on timeout.
+        const waitForChange = async (before, timeout) => {
+            const start = performance.now();
+            while (performance.now() - start < timeout) {
+                await new Promise((resolve) => setTimeout(resolve, Math.min(50, timeout)));
+                const [height, rows] = sample();
+                if (height !== before[0] || rows !== before[1]) {
+                    return performance.now() - start;
+                }
+            }
+            return null;
+        };
+        let wait = waitMs;
+        let stable = 0;
+        for (let i = 0; i < maxIter; i++) {
+            const before = sample();
+            el.scrollTo(0, el.scrollHeight);
+            el.dispatchEvent(new Event("scroll", { bubbles: true }));
+            const elapsed = await waitForChange(before, wait);
+            if (elapsed === null) {
+                if (wait < waitMs) {
+                    wait = Math.min(waitMs, wait * 2);
+                    continue;
+                }
+                stable += 1;
+                // Require several stable rounds to reduce early-stop on slow updates.
+                if (stable >= 3) {
+                    break;
+                }
+            } else {
+                stable = 0;
+                if (elapsed < wait / 2) {
+                    wait = Math.max(50, Math.floor(wait / 2));
+                }
+            }
+        }
+        const [height, rows] = sample();
+        return { height, rows };
+    }
+"""
+
+
 def _perform_infinite_scroll(page: Union[Page, Frame], scroll: ScrollSettings) -> None:
     container_selector = scroll.container
     if not container_selector:
         container_selector = "body"
 
-    last_height = -1
-    last_rows = -1
-    stable_rounds = 0
-
-    def _count_rows() -> int:
-        try:
-            return page.locator("#gridDatas li").count()
-        except PlaywrightError:
-            return -1
-
-    for _ in range(scroll.max_iterations):
-        try:
-            page.eval_on_selector(
-                container_selector,
-                "(el) => { el.scrollTo(0, el.scrollHeight); el.dispatchEvent(new Event('scroll', { bubbles: true })); }",
-            )
-        except PlaywrightError:
-            # Fall back to top-level page scroll when container scroll fails.
-            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-
-        page.wait_for_timeout(scroll.wait_for_ms)
-        try:
-            height = page.eval_on_selector(
-                container_selector,
-                "(el) => el.scrollHeight",
-            )
-        except PlaywrightError:
-            height = page.evaluate("document.body.scrollHeight")
-
-        rows = _count_rows()
-        if height == last_height and rows == last_rows:
-            stable_rounds += 1
-        else:
-            stable_rounds = 0
+    page.evaluate(
+        _INFINITE_SCROLL_JS,
+        {
+            "selector": container_selector,
+            "rowSelector": scroll.row_selector,
+            "waitMs": scroll.wait_for_ms,
+            "maxIter": scroll.max_iterations,
+        },
+    )
 
-        # Require several stable rounds to reduce early-stop on slow updates.
-        if stable_rounds >= 3:
-            break
 
-        last_height = height
-        last_rows = rows
+# Resolves as soon as a load-more click produced new rows or the button went
+# away, instead of sleeping a fixed delay and probing the button again.
+_LOAD_MORE_SETTLED_JS = """
+    ({ button, rowSelector, previous }) => {
+        const rows = document.querySelectorAll(rowSelector).length;
+        const gone = !document.querySelector(button);
+        return gone || rows > previous ? { gone, rows } : false;
+    }
+"""
 
 
 def _perform_load_more(page: Page, scroll: ScrollSettings) -> None:
     if not scroll.load_more_button:
         raise ValueError("load_more mode requires load_more_button selector")
 
+    previous = page.evaluate("(selector) => document.querySelectorAll(selector).length", scroll.row_selector)
     for _ in range(scroll.max_iterations):
         try:
             button = page.wait_for_selector(scroll.load_more_button, timeout=1000)
@@ -192,9 +422,18 @@ def _perform_load_more(page: Page, scroll: ScrollSettings) -> None:
             break
 
         button.click()
-        page.wait_for_timeout(scroll.wait_for_ms)
-        # In case the button disappears after loading finishes
         try:
-            page.wait_for_selector(scroll.load_more_button, timeout=500)
+            handle = page.wait_for_function(
+                _LOAD_MORE_SETTLED_JS,
+                arg={"button": scroll.load_more_button, "rowSelector": scroll.row_selector, "previous": previous},
+                timeout=scroll.wait_for_ms + 500,
+            )
         except PlaywrightTimeout:
+            # No new rows yet; the next iteration re-checks the button.
+            continue
+
+        settled = handle.json_value()
+        # In case the button disappears after loading finishes
+        if settled["gone"]:
             break
+        previous = settled["rows"]
@@ -7,15 +7,21 @@ the tabular data, and persists it using the storage layer.
 
 from __future__ import annotations
 
+import copy
+import hashlib
+import itertools
 import logging
 import html
+import os
 import re
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
 
+import orjson
 import yaml
 
 try:
@@ -24,17 +30,40 @@ except ImportError:  # pragma: no cover
     from pytz import timezone as ZoneInfo  # type: ignore
 
 from playwright.sync_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeout
+from selectolax.lexbor import LexborHTMLParser
 
-from .browser import BrowserConfig, browser_page, navigate_to_table, perform_scroll
-from .parser import ParsedRow, build_header_mapping, parse_row
+from .browser import BrowserConfig, BrowserPool, navigate_to_table, perform_scroll, pooled_page
+from .parser import build_header_mapping, parse_row
 from .selectors import PageSelectors, get_all_pages
-from .storage import UpsertResult, get_session_factory, upsert_row
+from .storage import get_session_factory, upsert_rows_bulk
 
 logger = logging.getLogger(__name__)
 
 # 直辖市：这些省份本身就是城市级别，无需城市子选项
 MUNICIPALITY_PROVINCES = {"北京市", "天津市", "上海市", "重庆市"}
 
+# Publish API requests kept in flight at once inside the page.
+MAX_PARALLEL_FETCHES = 8
+
+# Area/river scopes fetched, merged and yielded together; bounds how many raw
+# API responses are held at once.
+API_SCOPE_GROUP_SIZE = 4 * MAX_PARALLEL_FETCHES
+
+# Parsed rows handed to upsert_rows_bulk at a time while results stream in.
+UPSERT_BATCH_SIZE = 500
+
+# Warm browser pool shared by every run_once call in this process.
+_BROWSER_POOL: Optional[BrowserPool] = None
+
+# Parsed settings keyed by (path, st_mtime_ns); see load_settings.
+_SETTINGS_CACHE: Dict[Tuple[str, int], Dict[str, object]] = {}
+
+# libyaml 可用时用 C 解析器，否则退回纯 Python 实现
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Snapshot files are written off the scraping thread; run_once waits for them.
+_SNAPSHOT_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="snapshot")
+
 
 @dataclass
 class JobStats:
@@ -54,8 +83,29 @@ class SelectorValidationError(RuntimeError):
 
 
 def load_settings(settings_path: Path) -> Dict[str, object]:
-    with settings_path.open("r", encoding="utf-8") as handle:
-        return yaml.safe_load(handle)["default"]
+    """
+    Return the `default` section of the YAML settings file.
+
+    Results are memoised in-process per modification time, so YAML is only
+    parsed again after the file changes.
+    """
+    key = (str(settings_path), os.stat(settings_path).st_mtime_ns)
+    settings = _SETTINGS_CACHE.get(key)
+    if settings is None:
+        with settings_path.open("r", encoding="utf-8") as handle:
+            settings = yaml.load(handle, Loader=_YAML_LOADER)["default"]
+        _SETTINGS_CACHE[key] = settings
+    return copy.deepcopy(settings)
+
+
+def _get_browser_pool(config: BrowserConfig) -> BrowserPool:
+    """Return the process-wide browser pool, relaunching it when the config changes."""
+    global _BROWSER_POOL
+    if _BROWSER_POOL is None or _BROWSER_POOL.config != config:
+        if _BROWSER_POOL is not None:
+            _BROWSER_POOL.shutdown()
+        _BROWSER_POOL = BrowserPool(config)
+    return _BROWSER_POOL
 
 
 def run_once() -> JobStats:
@@ -81,133 +131,310 @@ def run_once() -> JobStats:
         headless=bool(playwright_cfg.get("headless", True)),
         timeout_ms=int(playwright_cfg.get("timeout_ms", 15_000)),
     )
+    if "block_resources" in playwright_cfg:
+        browser_cfg.block_resources = frozenset(playwright_cfg.get("block_resources") or ())
 
     stats = JobStats(database_path=str(db_path))
     pages: List[PageSelectors] = get_all_pages()
 
-    max_attempts = 5
+    always_snapshot = bool(settings.get("always_snapshot", False))
+    snapshot_writes: List[Future] = []
 
     with SessionFactory() as session:
-        for page_config in pages:
-            last_error: Optional[SelectorValidationError] = None
-            for attempt in range(1, max_attempts + 1):
-                logger.info("Processing page %s (attempt %s/%s)", page_config.url, attempt, max_attempts)
-                try:
-                    with browser_page(browser_cfg) as page:
-                        try:
-                            frame = navigate_to_table(page, page_config)
-                        except PlaywrightError as exc:
-                            raise SelectorValidationError(
-                                f"无法根据 iframe 选择器进入目标页面: {exc}",
-                                "请检查 iframe_chain 是否完整，并确保每个选择器都能唯一定位到 iframe 元素。",
-                            ) from exc
-
-                        raw_headers, row_payloads = _extract_rows_via_publish_api(frame)
-                        if raw_headers and row_payloads:
-                            logger.info("Using publish API extraction, rows=%s", len(row_payloads))
-                        else:
-                            logger.warning("Publish API extraction returned no rows, falling back to DOM selectors.")
-                            _select_national_scope(frame)
-                            perform_scroll(frame, page_config.scroll)
-
-                            try:
-                                table_root = frame.wait_for_selector(
-                                    page_config.table.table_container,
-                                    timeout=browser_cfg.timeout_ms,
-                                )
-                            except PlaywrightTimeout as exc:
-                                raise SelectorValidationError(
-                                    f"未找到表格容器选择器: {page_config.table.table_container}",
-                                    "请在 Chrome DevTools 中重新确认 TableSelectors.table_container 是否指向包含数据表的元素。",
-                                ) from exc
-
-                            if table_root is None:
-                                raise SelectorValidationError(
-                                    f"表格容器选择器返回空元素: {page_config.table.table_container}",
-                                    "请确保 table_container 指向页面上的真实表格容器。",
-                                )
-
-                            raw_headers = _extract_headers(frame, page_config)
-                            row_payloads = list(_extract_rows(frame, page_config, raw_headers))
-
-                        snapshot_path = _save_snapshot(
-                            frame,
-                            project_root,
-                            page_config,
-                            batch_time,
-                            stats.pages_processed,
-                        )
-                        stats.snapshots.append(snapshot_path)
-
-                        normalized_headers = build_header_mapping(raw_headers)
-                        if not normalized_headers:
-                            raise SelectorValidationError(
-                                "未能解析到任何表头文本。",
-                                "请确认 header_cells 选择器能够匹配到 <th> 元素，或更新 column_overrides。",
-                            )
-
-                        if not row_payloads:
-                            raise SelectorValidationError(
-                                "表格数据行未匹配到。",
-                                "请检查 data_rows / cell_selector 设置，确保它们指向实际的数据行与单元格。",
-                            )
-
-                        for row_payload in row_payloads:
-                            row_texts = row_payload["cells"]
-                            extras = row_payload.get("extras")
-                            parsed = parse_row(normalized_headers, row_texts, tz_name, extras=extras)
-                            stats.rows_seen += 1
-                            result = upsert_row(
-                                session,
-                                parsed.station,
-                                parsed.reading,
-                                batch_time,
-                            )
-                            if result.created:
-                                stats.rows_inserted += 1
-
-                    stats.pages_processed += 1
-                    last_error = None
-                    break
-                except SelectorValidationError as exc:
-                    session.rollback()
-                    last_error = exc
-                    if attempt >= max_attempts:
-                        raise
-                    logger.warning("Attempt %s/%s failed: %s，retrying...", attempt, max_attempts, exc)
-                    time.sleep(1)
-                    continue
-                except PlaywrightError as exc:
-                    session.rollback()
-                    raise SelectorValidationError(
-                        f"页面交互过程中出现 Playwright 错误: {exc}",
-                        "请确认页面结构是否发生变化，必要时调整选择器或增加超时时间。",
-                    ) from exc
-
-            if last_error:
-                raise last_error
+        # One tab serves every page and retry of this run.
+        with pooled_page(_get_browser_pool(browser_cfg)) as page:
+            for page_index, page_config in enumerate(pages):
+                if page_index:
+                    # 各页面之间不共享站点会话状态
+                    page.context.clear_cookies()
+                _process_page_with_retries(
+                    page,
+                    session,
+                    stats,
+                    page_config,
+                    browser_cfg,
+                    project_root,
+                    batch_time,
+                    page_index,
+                    always_snapshot,
+                    tz,
+                    snapshot_writes,
+                )
+                logger.info("Finished page %s", page_config.url)
 
         session.commit()
 
+    for snapshot_write in snapshot_writes:
+        snapshot_write.result()
     return stats
 
 
-def _extract_headers(frame, page_config: PageSelectors) -> List[str]:
-    """Return plain-text headers from the configured selectors."""
-    table = frame.query_selector(page_config.table.table_container)
-    if table is None:
+@dataclass
+class _ScrapedPage:
+    """Normalised headers, streamed row payloads and the pending snapshot of one page."""
+
+    headers: List[str]
+    rows: Iterable[Dict[str, Any]]
+    snapshot: Optional[Tuple[Path, Future]] = None
+
+
+def _process_page_with_retries(
+    page,
+    session,
+    stats: JobStats,
+    page_config: PageSelectors,
+    browser_cfg: BrowserConfig,
+    project_root: Path,
+    batch_time: datetime,
+    page_index: int,
+    always_snapshot: bool,
+    tz,
+    snapshot_writes: List[Future],
+    max_attempts: int = 5,
+) -> None:
+    """
+    Scrape and persist one page, retrying the whole page up to `max_attempts` times.
+
+    Rows stream from the browser while they are written, so fetch failures
+    surface during persistence; each attempt runs inside a savepoint and a
+    failed one is rolled back before the page is scraped again.
+    """
+    for attempt in range(1, max_attempts + 1):
+        logger.info("Processing page %s (attempt %s/%s)", page_config.url, attempt, max_attempts)
+        scraped: Optional[_ScrapedPage] = None
+        savepoint = session.begin_nested()
+        try:
+            try:
+                scraped = _scrape_page(
+                    page, page_config, browser_cfg, project_root, batch_time, page_index, always_snapshot
+                )
+                rows_written, rows_inserted = _persist_page(session, scraped.headers, scraped.rows, tz, batch_time)
+            except PlaywrightError as exc:
+                raise SelectorValidationError(
+                    f"页面交互过程中出现 Playwright 错误: {exc}",
+                    "请确认页面结构是否发生变化，必要时调整选择器或增加超时时间。",
+                ) from exc
+        except SelectorValidationError as exc:
+            savepoint.rollback()
+            if scraped is not None and scraped.snapshot is not None:
+                snapshot_writes.append(scraped.snapshot[1])
+            if attempt >= max_attempts:
+                raise
+            logger.warning("Attempt %s/%s failed: %s，retrying...", attempt, max_attempts, exc)
+            time.sleep(1)
+            continue
+
+        savepoint.commit()
+        if scraped.snapshot is not None:
+            stats.snapshots.append(scraped.snapshot[0])
+            snapshot_writes.append(scraped.snapshot[1])
+        stats.rows_seen += rows_written
+        stats.rows_inserted += rows_inserted
+        stats.pages_processed += 1
+        logger.info("Persisted rows=%s", rows_written)
+        return
+    raise AssertionError("unreachable")  # pragma: no cover
+
+
+def _scrape_page(
+    page,
+    page_config: PageSelectors,
+    browser_cfg: BrowserConfig,
+    project_root: Path,
+    batch_time: datetime,
+    page_index: int,
+    always_snapshot: bool,
+) -> _ScrapedPage:
+    """Navigate to one target page and return its headers and row stream."""
+    try:
+        frame = navigate_to_table(page, page_config, browser_cfg.timeout_ms)
+    except PlaywrightError as exc:
+        raise SelectorValidationError(
+            f"无法根据 iframe 选择器进入目标页面: {exc}",
+            "请检查 iframe_chain 是否完整，并确保每个选择器都能唯一定位到 iframe 元素。",
+        ) from exc
+
+    page_html: Optional[str] = None
+    api_rows = _extract_rows_via_publish_api(frame)
+    first_row = next(api_rows, None)
+    used_api = first_row is not None and bool(first_row[0])
+    row_payloads: Iterable[Dict[str, Any]]
+    if used_api:
+        logger.info("Using publish API extraction.")
+        raw_headers = first_row[0]
+        row_payloads = itertools.chain([first_row[1]], (row_payload for _, row_payload in api_rows))
+    else:
+        logger.warning("Publish API extraction returned no rows, falling back to DOM selectors.")
+        _select_national_scope(frame)
+        perform_scroll(frame, page_config.scroll)
+
+        try:
+            table_root = frame.wait_for_selector(
+                page_config.table.table_container,
+                timeout=browser_cfg.timeout_ms,
+            )
+        except PlaywrightTimeout as exc:
+            raise SelectorValidationError(
+                f"未找到表格容器选择器: {page_config.table.table_container}",
+                "请在 Chrome DevTools 中重新确认 TableSelectors.table_container 是否指向包含数据表的元素。",
+            ) from exc
+
+        if table_root is None:
+            raise SelectorValidationError(
+                f"表格容器选择器返回空元素: {page_config.table.table_container}",
+                "请确保 table_container 指向页面上的真实表格容器。",
+            )
+
+        page_html = frame.content()
+        raw_headers, row_payloads = _extract_table(page_html, page_config)
+
+    snapshot: Optional[Tuple[Path, Future]] = None
+    # API 响应本身就是数据来源，快照只在 DOM 兜底（或显式要求）时保存
+    if always_snapshot or not used_api:
+        snapshot = _save_snapshot(
+            page_html if page_html is not None else frame.content(),
+            project_root,
+            page_config,
+            batch_time,
+            page_index,
+        )
+
+    normalized_headers = build_header_mapping(raw_headers)
+    if not normalized_headers:
+        raise SelectorValidationError(
+            "未能解析到任何表头文本。",
+            "请确认 header_cells 选择器能够匹配到 <th> 元素，或更新 column_overrides。",
+        )
+
+    # The API stream always starts with a row; only the DOM list can be empty.
+    if not used_api and not row_payloads:
+        raise SelectorValidationError(
+            "表格数据行未匹配到。",
+            "请检查 data_rows / cell_selector 设置，确保它们指向实际的数据行与单元格。",
+        )
+    return _ScrapedPage(headers=normalized_headers, rows=row_payloads, snapshot=snapshot)
+
+
+def _persist_page(
+    session,
+    headers: List[str],
+    row_payloads: Iterable[Dict[str, Any]],
+    tz,
+    batch_time: datetime,
+) -> Tuple[int, int]:
+    """
+    Parse and upsert row payloads in `UPSERT_BATCH_SIZE` batches as they stream in.
+
+    Returns `(rows_written, rows_inserted)`.
+    """
+    rows_written = 0
+    rows_inserted = 0
+    payload_iter = iter(row_payloads)
+    while True:
+        batch = list(itertools.islice(payload_iter, UPSERT_BATCH_SIZE))
+        if not batch:
+            break
+        parsed_rows = [
+            parse_row(headers, row_payload["cells"], tz, extras=row_payload.get("extras"))
+            for row_payload in batch
+        ]
+        rows_written += len(parsed_rows)
+        rows_inserted += upsert_rows_bulk(
+            session,
+            [parsed.station for parsed in parsed_rows],
+            [parsed.reading for parsed in parsed_rows],
+            batch_time,
+        )
+    return rows_written, rows_inserted
+
+
+# Replays a batch of Publish.ashx requests inside the page, keeping at most
+# `limit` of them in flight. Returns the raw response bodies (null on network
+# errors) in the order of `requests`; JSON decoding happens in Python.
+_PUBLISH_FETCH_JS = """
+async ({ requests, limit }) => {
+    const fetchOne = async ({ areaId, riverId, pageIndex, pageSize }) => {
+        const params = new URLSearchParams();
+        params.set("action", "getRealDatas");
+        params.set("AreaID", areaId || "");
+        params.set("RiverID", riverId || "");
+        params.set("MNName", "");
+        params.set("PageIndex", String(pageIndex));
+        params.set("PageSize", String(pageSize));
+        const resp = await fetch("/GJZ/Ajax/Publish.ashx", {
+            method: "POST",
+            headers: {
+                "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+                "X-Requested-With": "XMLHttpRequest"
+            },
+            body: params.toString(),
+            credentials: "same-origin"
+        });
+        return await resp.text();
+    };
+    const results = new Array(requests.length);
+    let next = 0;
+    const worker = async () => {
+        while (next < requests.length) {
+            const index = next++;
+            try {
+                results[index] = await fetchOne(requests[index]);
+            } catch (e) {
+                results[index] = null;
+            }
+        }
+    };
+    const width = Math.max(1, Math.min(limit, requests.length));
+    await Promise.all(Array.from({ length: width }, worker));
+    return results;
+}
+"""
+
+
+def _fetch_publish_pages(frame, requests: List[Dict[str, Any]]) -> List[Any]:
+    """Run `requests` through `_PUBLISH_FETCH_JS`; failed batches yield None per request."""
+    if not requests:
         return []
+    try:
+        bodies = frame.evaluate(_PUBLISH_FETCH_JS, {"requests": requests, "limit": MAX_PARALLEL_FETCHES})
+    except PlaywrightError:
+        return [None] * len(requests)
+    if not isinstance(bodies, list) or len(bodies) != len(requests):
+        return [None] * len(requests)
+
+    payloads: List[Any] = []
+    for body in bodies:
+        if not isinstance(body, str):
+            payloads.append(None)
+            continue
+        try:
+            payloads.append(orjson.loads(body))
+        except orjson.JSONDecodeError:
+            payloads.append({"result": 0, "error": body[:300]})
+    return payloads
 
-    header_elements = table.query_selector_all(page_config.table.header_cells)
-    return [element.inner_text().strip() for element in header_elements]
+
+def _dedupe_digest(cells: List[str]) -> bytes:
+    """
+    8-byte digest of a row's first five cells, used as its dedupe key.
+
+    Much smaller than the joined string, and unlike a Bloom filter it never
+    drops a genuinely new row (collisions are ~2^-64 per pair).
+    """
+    return hashlib.blake2b("\x1f".join(cells[:5]).encode("utf-8"), digest_size=8).digest()
 
 
-def _extract_rows_via_publish_api(frame) -> Tuple[List[str], List[Dict[str, Any]]]:
+def _extract_rows_via_publish_api(frame) -> Iterator[Tuple[List[str], Dict[str, Any]]]:
     """
     Prefer the site's own publish API over brittle UI scrolling.
 
     The frontend script `RealDatas.js` queries `/GJZ/Ajax/Publish.ashx` with
-    action=`getRealDatas`. We replay that request per province and merge rows.
+    action=`getRealDatas`. We replay that request per province and stream the
+    merged rows as `(headers, row_payload)` pairs; nothing is yielded when the
+    API is unusable.
+
+    Only dedupe keys are kept for rows already yielded. Rows without a city
+    are held back until the end, because a later duplicate may still supply it.
     """
     try:
         frame.wait_for_function(
@@ -215,11 +442,11 @@ def _extract_rows_via_publish_api(frame) -> Tuple[List[str], List[Dict[str, Any]
             timeout=8_000,
         )
     except PlaywrightTimeout:
-        return [], []
+        return
 
     area_ids, province_names_by_id, city_options_by_province = _extract_area_metadata(frame)
     if not area_ids:
-        return [], []
+        return
 
     try:
         river_ids = frame.evaluate(
@@ -231,146 +458,149 @@ def _extract_rows_via_publish_api(frame) -> Tuple[List[str], List[Dict[str, Any]
         river_ids = []
 
     headers: List[str] = []
-    rows: List[Dict[str, Any]] = []
-    row_by_key: Dict[Tuple[str, ...], Dict[str, Any]] = {}
-
-    fetch_script = """
-        async ({ areaId, riverId, pageIndex, pageSize }) => {
-            const params = new URLSearchParams();
-            params.set("action", "getRealDatas");
-            params.set("AreaID", areaId || "");
-            params.set("RiverID", riverId || "");
-            params.set("MNName", "");
-            params.set("PageIndex", String(pageIndex));
-            params.set("PageSize", String(pageSize));
-            const resp = await fetch("/GJZ/Ajax/Publish.ashx", {
-                method: "POST",
-                headers: {
-                    "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
-                    "X-Requested-With": "XMLHttpRequest"
-                },
-                body: params.toString(),
-                credentials: "same-origin"
-            });
-            const text = await resp.text();
-            try {
-                return JSON.parse(text);
-            } catch (e) {
-                return { result: 0, error: text.slice(0, 300) };
-            }
-        }
-    """
+    seen_keys: Set[bytes] = set()
+    pending_by_key: Dict[bytes, Dict[str, Any]] = {}
+    ready: List[Dict[str, Any]] = []
 
-    def collect_scope(area_id: str, river_id: str, scope_label: str, city_name: Optional[str] = None) -> int:
-        page_index = 1
-        total_pages = 1
-        scope_rows = 0
-        while page_index <= total_pages and page_index <= 200:
-            try:
-                payload = frame.evaluate(
-                    fetch_script,
-                    {"areaId": area_id, "riverId": river_id, "pageIndex": page_index, "pageSize": 9999},
-                )
-            except PlaywrightError:
-                break
+    def page_request(scope: Tuple[str, str, str, Optional[str]], page_index: int) -> Dict[str, Any]:
+        area_id, river_id, _, _ = scope
+        return {"areaId": area_id, "riverId": river_id, "pageIndex": page_index, "pageSize": 9999}
 
-            if not isinstance(payload, dict) or not payload.get("result"):
-                break
+    def page_count(payload: Dict[str, Any]) -> int:
+        try:
+            return max(1, int(payload.get("total") or 1))
+        except (TypeError, ValueError):
+            return 1
 
-            if not headers:
-                thead = payload.get("thead") or []
-                if isinstance(thead, list):
-                    headers.extend(_normalize_api_text(item) for item in thead)
+    def merge_payload(payload: Any, city_name: Optional[str]) -> Optional[int]:
+        """Merge one API response into `rows`; None marks an unusable response."""
+        if not isinstance(payload, dict) or not payload.get("result"):
+            return None
 
-            tbody = payload.get("tbody") or []
-            if not isinstance(tbody, list):
-                break
+        if not headers:
+            thead = payload.get("thead") or []
+            if isinstance(thead, list):
+                headers.extend(_normalize_api_text(item) for item in thead)
 
-            for row in tbody:
-                if not isinstance(row, list):
-                    continue
-                raw_cells = ["" if item is None else str(item) for item in row]
-                cells = [_normalize_api_text(item) for item in raw_cells]
-                if not cells:
-                    continue
-                dedupe_key = tuple(cells[:5])
-                existing = row_by_key.get(dedupe_key)
-                extras: Dict[str, Optional[str]] = {}
-                # 优先使用传入的城市名，其次尝试从 API 单元格提取
-                if city_name:
-                    extras["city"] = city_name
-                else:
-                    city = _extract_city_from_api_cells(raw_cells)
-                    if city:
-                        extras["city"] = city
-
-                if existing:
-                    existing_city = (existing.get("extras") or {}).get("city")
-                    if city and not existing_city:
-                        existing.setdefault("extras", {})["city"] = city
-                    continue
+        tbody = payload.get("tbody") or []
+        if not isinstance(tbody, list):
+            return None
 
-                row_payload = {"cells": cells, "extras": extras}
-                rows.append(row_payload)
-                row_by_key[dedupe_key] = row_payload
-                scope_rows += 1
+        added = 0
+        for row in tbody:
+            if not isinstance(row, list):
+                continue
+            raw_cells = ["" if item is None else str(item) for item in row]
+            cells = [_normalize_api_text(item) for item in raw_cells]
+            if not cells:
+                continue
+            dedupe_key = _dedupe_digest(cells)
+            if dedupe_key in seen_keys:
+                continue
+            # 优先使用传入的城市名，其次尝试从 API 单元格提取
+            city = city_name or _extract_city_from_api_cells(raw_cells)
+
+            pending = pending_by_key.get(dedupe_key)
+            if pending is not None:
+                if city:
+                    pending["extras"]["city"] = city
+                    ready.append(pending_by_key.pop(dedupe_key))
+                    seen_keys.add(dedupe_key)
+                continue
 
-            try:
-                total_pages = max(1, int(payload.get("total") or 1))
-            except (TypeError, ValueError):
-                total_pages = 1
-            page_index += 1
+            if city:
+                ready.append({"cells": cells, "extras": {"city": city}})
+                seen_keys.add(dedupe_key)
+            else:
+                pending_by_key[dedupe_key] = {"cells": cells, "extras": {}}
+            added += 1
+        return added
+
+    def collect_group(scopes: List[Tuple[str, str, str, Optional[str]]]) -> Iterator[Dict[str, Any]]:
+        # First pages of the group go out as one batch; their totals decide
+        # the follow-up pages, which are then fetched together as a second
+        # batch. Merging still walks each scope's pages in order.
+        first_pages = _fetch_publish_pages(frame, [page_request(scope, 1) for scope in scopes])
+        follow_ups: List[Tuple[int, int]] = []
+        for scope_index, payload in enumerate(first_pages):
+            if isinstance(payload, dict) and payload.get("result"):
+                last_page = min(page_count(payload), 200)
+                follow_ups.extend((scope_index, page_index) for page_index in range(2, last_page + 1))
+        follow_up_payloads: Dict[int, List[Any]] = {}
+        fetched = _fetch_publish_pages(
+            frame,
+            [page_request(scopes[scope_index], page_index) for scope_index, page_index in follow_ups],
+        )
+        for (scope_index, _), payload in zip(follow_ups, fetched):
+            follow_up_payloads.setdefault(scope_index, []).append(payload)
+        del fetched
+
+        for scope_index, scope in enumerate(scopes):
+            _, _, scope_label, city_name = scope
+            scope_payloads = [first_pages[scope_index], *follow_up_payloads.pop(scope_index, [])]
+            # 合并完即释放该范围的响应，组内峰值只保留尚未合并的部分
+            first_pages[scope_index] = None
+            scope_rows = 0
+            for payload in scope_payloads:
+                added = merge_payload(payload, city_name)
+                yield from ready
+                ready.clear()
+                if added is None:
+                    break
+                scope_rows += added
+            logger.info("API %s -> rows=%s", scope_label, scope_rows)
 
-        logger.info("API %s -> rows=%s", scope_label, scope_rows)
-        return scope_rows
+    def collect_scopes(scopes: List[Tuple[str, str, str, Optional[str]]]) -> Iterator[Dict[str, Any]]:
+        # 按组抓取、合并并产出，下一组请求发出前上一组的响应已可回收
+        for offset in range(0, len(scopes), API_SCOPE_GROUP_SIZE):
+            yield from collect_group(scopes[offset : offset + API_SCOPE_GROUP_SIZE])
 
     # 按城市级别遍历采集，自动注入城市名
+    area_scopes: List[Tuple[str, str, str, Optional[str]]] = []
     for province_id in area_ids:
         province_name = province_names_by_id.get(province_id, "")
         city_list = city_options_by_province.get(province_id, [])
         if city_list:
             # 普通省份：遍历其下所有城市
             for city_id, city_label in city_list:
-                collect_scope(
-                    area_id=city_id,
-                    river_id="",
-                    scope_label=f"city:{city_label}",
-                    city_name=city_label,
-                )
+                area_scopes.append((city_id, "", f"city:{city_label}", city_label))
         else:
             # 直辖市或无城市子选项的省份
             city_value = province_name if province_name in MUNICIPALITY_PROVINCES else None
-            collect_scope(
-                area_id=province_id,
-                river_id="",
-                scope_label=f"area:{province_id}",
-                city_name=city_value,
-            )
+            area_scopes.append((province_id, "", f"area:{province_id}", city_value))
+    for row_payload in collect_scopes(area_scopes):
+        yield headers, row_payload
 
     # Fallback enrichment: if area pass is unexpectedly small, add river pass.
-    if len(rows) < 1000 and river_ids:
-        logger.warning("Area API rows=%s is lower than expected, running river fallback pass.", len(rows))
-        for river_id in river_ids:
-            collect_scope(area_id="", river_id=river_id, scope_label=f"river:{river_id}")
+    row_count = len(seen_keys) + len(pending_by_key)
+    if row_count < 1000 and river_ids:
+        logger.warning("Area API rows=%s is lower than expected, running river fallback pass.", row_count)
+        for row_payload in collect_scopes([("", river_id, f"river:{river_id}", None) for river_id in river_ids]):
+            yield headers, row_payload
 
-    return headers, rows
+    for row_payload in pending_by_key.values():
+        yield headers, row_payload
 
 
 _HTML_TAG_RE = re.compile(r"<[^>]+>")
 _CITY_HINT_RE = re.compile(r"所在地市\s*[:：]\s*([^\n\r<\"]+)")
+_API_TEXT_TRANSLATE = str.maketrans({"\xa0": " ", "\n": None})
+_RAW_VALUE_RE = re.compile(r"原始值[ \t]*[:：]?[ \t]*([^\r\n<]+)")
+_CITY_LINE_RE = re.compile(r"^\s*所在地市:([^\r\n]*)", re.MULTILINE)
 
 
 def _normalize_api_text(value: Any) -> str:
     if value is None:
         return ""
-    text = str(value)
+    text = value if isinstance(value, str) else str(value)
+    if "<" not in text and "&" not in text and "\xa0" not in text and "\n" not in text:
+        # 绝大多数单元格是干净的短数字串
+        return text.strip()
     if "<" in text and ">" in text:
         text = _HTML_TAG_RE.sub("", text)
-    text = text.replace("&nbsp;", "").replace("\xa0", " ").replace("\n", "")
-    text = text.strip()
-    if text == "--":
-        return "--"
-    return text
+    if "&" in text:
+        text = text.replace("&nbsp;", "")
+    return text.translate(_API_TEXT_TRANSLATE).strip()
 
 
 def _extract_area_metadata(frame) -> Tuple[List[str], Dict[str, str], Dict[str, List[Tuple[str, str]]]]:
@@ -386,17 +616,25 @@ def _extract_area_metadata(frame) -> Tuple[List[str], Dict[str, str], Dict[str,
         raw = frame.evaluate(
             """
             () => {
+                const FILTER_AREA_RE = /filterArea\\('([^']*)','([^']*)',(\\d+)\\)/;
+                // Same cleanup as _normalize_api_text, done once here.
+                const clean = (value) => String(value || "")
+                    .replace(/<[^>]+>/g, "")
+                    .replace(/&nbsp;/g, "")
+                    .replace(/\\u00a0/g, " ")
+                    .replace(/\\n/g, "")
+                    .trim();
                 const payload = { items: [] };
                 const anchors = Array.from(document.querySelectorAll("#ddm_Area + ul a[onclick*='filterArea(']"));
                 for (const anchor of anchors) {
-                    const onclick = anchor.getAttribute("onclick") || "";
-                    const m = onclick.match(/filterArea\\('([^']*)','([^']*)',(\\d+)\\)/);
+                    const m = (anchor.getAttribute("onclick") || "").match(FILTER_AREA_RE);
                     if (!m) continue;
-                    const id = String(m[1] || "");
-                    const label = String(m[2] || "");
-                    const level = Number(m[3] || "0");
-                    const parentId = String(anchor.getAttribute("data-id") || "");
-                    payload.items.push({ id, label, level, parentId });
+                    payload.items.push({
+                        id: clean(m[1]),
+                        label: clean(m[2]),
+                        level: Number(m[3] || "0"),
+                        parentId: clean(anchor.getAttribute("data-id")),
+                    });
                 }
                 return payload;
             }
@@ -416,9 +654,9 @@ def _extract_area_metadata(frame) -> Tuple[List[str], Dict[str, str], Dict[str,
         for item in items:
             if not isinstance(item, dict):
                 continue
-            area_id = _normalize_api_text(item.get("id"))
-            label = _normalize_api_text(item.get("label"))
-            parent_id = _normalize_api_text(item.get("parentId"))
+            area_id = str(item.get("id") or "")
+            label = str(item.get("label") or "")
+            parent_id = str(item.get("parentId") or "")
             try:
                 level = int(item.get("level") or 0)
             except (TypeError, ValueError):
@@ -481,75 +719,85 @@ def _extract_city_from_api_cells(raw_cells: List[str]) -> Optional[str]:
     return None
 
 
-def _extract_rows(frame, page_config: PageSelectors, raw_headers: List[str]):
-    """Yield rows of text values using the configured selectors."""
-    table = frame.query_selector(page_config.table.table_container)
-    if table is None:
-        return []
+def _compile_column_overrides(
+    headers: Sequence[str], column_overrides: Mapping[str, str]
+) -> Tuple[Tuple[int, str], ...]:
+    """Map `column_overrides` onto header positions for one page."""
+    return tuple(
+        (index, selector)
+        for index, header in enumerate(headers)
+        if (selector := column_overrides.get(header))
+    )
 
-    def _cell_value(cell):
-        def _extract_raw(text: Optional[str]) -> Optional[str]:
-            if not text or "原始值" not in text:
-                return None
-            for line in text.splitlines():
-                if "原始值" in line:
-                    raw = line.split("原始值", 1)[-1]
-                    raw = raw.replace("：", "").replace(":", "").strip()
-                    if raw:
-                        return raw
-            return None
 
-        if not cell:
-            return ""
+def _extract_table(content: str, page_config: PageSelectors) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Return plain-text headers and row payloads from the frame HTML.
 
-        tooltip = cell.get_attribute("data-original-title")
-        raw = _extract_raw(tooltip)
+    Parsing `frame.content()` locally replaces one CDP round-trip per element;
+    the same HTML is reused for the page snapshot.
+    """
+    table = page_config.table
+    root = LexborHTMLParser(content).css_first(table.table_container)
+    if root is None:
+        return [], []
+
+    def _extract_raw(text: Optional[str]) -> Optional[str]:
+        match = _RAW_VALUE_RE.search(text) if text else None
+        return (match.group(1).replace("：", "").replace(":", "").strip() or None) if match else None
+
+    def _cell_value(cell) -> str:
+        if cell is None:
+            return ""
+        raw = _extract_raw(cell.attributes.get("data-original-title"))
         if raw:
             return raw
-
-        inner = cell.query_selector("[data-original-title]")
-        if inner:
-            raw = _extract_raw(inner.get_attribute("data-original-title"))
+        inner = cell.css_first("[data-original-title]")
+        if inner is not None:
+            raw = _extract_raw(inner.attributes.get("data-original-title"))
             if raw:
                 return raw
+        return cell.text(deep=True).strip()
 
-        return cell.inner_text().strip()
-
-    for row in table.query_selector_all(page_config.table.data_rows):
-        column_text: List[str]
-        if page_config.table.cell_selector:
-            cells = row.query_selector_all(page_config.table.cell_selector)
-            column_text = [_cell_value(cell) for cell in cells]
-        elif page_config.table.column_overrides:
-            column_text = []
-            for header in raw_headers:
-                selector = page_config.table.column_overrides.get(header)
-                if not selector:
-                    column_text.append("")
-                    continue
-                cell = row.query_selector(selector)
-                column_text.append(_cell_value(cell))
+    headers = [element.text(deep=True).strip() for element in root.css(table.header_cells)]
+    # 表头只解析一次，按列号预先编好覆盖选择器，行循环里不再按表头文本查字典
+    overrides = _compile_column_overrides(headers, table.column_overrides)
+
+    rows: List[Dict[str, Any]] = []
+    for row in root.css(table.data_rows):
+        if table.cell_selector:
+            cells = [_cell_value(cell) for cell in row.css(table.cell_selector)]
+        elif table.column_overrides:
+            cells = [""] * len(headers)
+            for index, selector in overrides:
+                cells[index] = _cell_value(row.css_first(selector))
         else:
-            cells = row.query_selector_all("td, th")
-            column_text = [_cell_value(cell) for cell in cells]
+            cells = [_cell_value(cell) for cell in row.css("td, th")]
 
         extras: Dict[str, Optional[str]] = {}
-        tooltip_host = row.query_selector("td.MN [data-original-title]")
-        if tooltip_host:
-            tooltip = tooltip_host.get_attribute("data-original-title") or ""
-            for line in tooltip.splitlines():
-                line = line.strip()
-                if line.startswith("所在地市:"):
-                    extras["city"] = line.split(":", 1)[1].strip() or None
-                    break
-
-        if column_text:
-            yield {"cells": column_text, "extras": extras}
+        tooltip_host = row.css_first("td.MN [data-original-title]")
+        if tooltip_host is not None:
+            match = _CITY_LINE_RE.search(tooltip_host.attributes.get("data-original-title") or "")
+            if match:
+                extras["city"] = match.group(1).strip() or None
+
+        if cells:
+            rows.append({"cells": cells, "extras": extras})
+    return headers, rows
 
 
-def _save_snapshot(frame, project_root: Path, page_config: PageSelectors, batch_time: datetime, page_index: int) -> Path:
+def _save_snapshot(
+    content: str,
+    project_root: Path,
+    page_config: PageSelectors,
+    batch_time: datetime,
+    page_index: int,
+) -> Tuple[Path, Future]:
     """
-    Persist the current HTML to data/snapshots for auditing.
+    Persist the page HTML to data/snapshots for auditing.
+
+    The file write runs on `_SNAPSHOT_POOL`; the returned future completes
+    once it is on disk.
     """
     snapshots_dir = project_root / "data" / "snapshots"
     snapshots_dir.mkdir(parents=True, exist_ok=True)
@@ -564,8 +812,7 @@ def _save_snapshot(frame, project_root: Path, page_config: PageSelectors, batch_
     )
     filename = f"{timestamp}_{page_index:02d}_{url_fragment}.html"
     snapshot_path = snapshots_dir / filename
-    snapshot_path.write_text(frame.content(), encoding="utf-8")
-    return snapshot_path
+    return snapshot_path, _SNAPSHOT_POOL.submit(snapshot_path.write_bytes, content.encode("utf-8"))
 
 
 def _select_national_scope(frame) -> None:
@@ -9,9 +9,12 @@ The functions here focus on:
 
 from __future__ import annotations
 
+import re
+import sys
 from dataclasses import dataclass
-from datetime import datetime
-from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from datetime import datetime, tzinfo
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Union
 
 try:
     from zoneinfo import ZoneInfo  # Python 3.9+
@@ -48,7 +51,21 @@ RAW_TO_FIELD = {
     "藻密度(cells/L)": "algae_density_cells_l",
 }
 
-NULL_TOKENS = {"", "-", "—", "--", "——", "null", "NULL", "9999", "NaN"}
+# Interned so header lookups (and the per-row dicts keyed by unknown metric
+# headers) compare by identity.
+RAW_TO_FIELD = {sys.intern(raw): field for raw, field in RAW_TO_FIELD.items()}
+
+# Line breaks (from <br> in header cells) and tabs are dropped before lookup.
+_HEADER_NORMALIZE = str.maketrans("", "", "\n\r\t")
+
+NULL_TOKENS = frozenset({"", "-", "—", "--", "——", "null", "NULL", "9999", "NaN"})
+
+# Non-ISO timestamp shapes tried with strptime before dateutil's fuzzy parser.
+# The site's own "02-08 12:00" carries no year.
+_TS_FMTS = ("%m-%d %H:%M", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M")
+
+# Plain decimals, the common case, go straight to float().
+_NUM_RE = re.compile(r"-?\d+(?:\.\d+)?")
 
 STATION_TEXT_FIELDS = {
     "province",
@@ -87,25 +104,49 @@ def build_header_mapping(headers: Iterable[str]) -> List[str]:
     Unknown labels are returned unchanged so they can be treated as metric
     names during row parsing.
     """
-    normalized: List[str] = []
-    for header in headers:
-        header = header.strip().replace("\n", "")
-        normalized.append(RAW_TO_FIELD.get(header, header))
-    return normalized
-
-
-def parse_timestamp(value: str, tz_name: str) -> Optional[datetime]:
-    """Parse timestamps into the requested timezone."""
+    keys = (sys.intern(header.translate(_HEADER_NORMALIZE).strip()) for header in headers)
+    return [RAW_TO_FIELD.get(key, key) for key in keys]
+
+
+def _parse_known_format(value: str) -> Optional[datetime]:
+    """Parse the timestamp shapes the site emits without dateutil; None if unknown."""
+    if value[:4].isdigit() and value[4:5] == "-":
+        # ISO 形式（YYYY-MM-DD[ HH:MM[:SS]]）走 fromisoformat，比 dateutil 快两个数量级
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    for fmt in _TS_FMTS:
+        try:
+            dt = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if "%Y" not in fmt:
+            # 与 dateutil 一致：缺省年份取当前年（02-29 在 1900 年解析失败，自然落回 dateutil）
+            dt = dt.replace(year=datetime.now().year)
+        return dt
+    return None
+
+
+@lru_cache(maxsize=8)
+def _tz(tz_name: str) -> tzinfo:
+    return ZoneInfo(tz_name)
+
+
+def parse_timestamp(value: str, tz_name: Union[str, tzinfo]) -> Optional[datetime]:
+    """Parse timestamps into the requested timezone (a name or a tzinfo)."""
     value = value.strip()
     if value in NULL_TOKENS:
         return None
 
-    dt = date_parser.parse(value, fuzzy=True)
+    dt = _parse_known_format(value)
+    if dt is None:
+        dt = date_parser.parse(value, fuzzy=True)
+
+    tz = tz_name if isinstance(tz_name, tzinfo) else _tz(tz_name)
     if dt.tzinfo is None:
-        tz = ZoneInfo(tz_name) if isinstance(ZoneInfo, type) else ZoneInfo(tz_name)
         dt = dt.replace(tzinfo=tz)
     else:
-        tz = ZoneInfo(tz_name) if isinstance(ZoneInfo, type) else ZoneInfo(tz_name)
         dt = dt.astimezone(tz)
     return dt
 
@@ -115,6 +156,8 @@ def parse_numeric(value: str) -> Optional[float]:
     raw = value.strip()
     if raw in NULL_TOKENS:
         return None
+    if _NUM_RE.fullmatch(raw):
+        return float(raw)
     try:
         return float(raw.replace(",", ""))
     except ValueError:
@@ -124,7 +167,7 @@ def parse_numeric(value: str) -> Optional[float]:
 def parse_row(
     headers: Sequence[str],
     cells: Sequence[str],
-    tz_name: str,
+    tz_name: Union[str, tzinfo],
     extras: Optional[Dict[str, Optional[str]]] = None,
 ) -> ParsedRow:
     """
@@ -137,7 +180,8 @@ def parse_row(
     cells
         Column values aligned with `headers`.
     tz_name
-        Target timezone; the observed_at timestamp is converted here.
+        Target timezone name or tzinfo; the observed_at timestamp is
+        converted here.
     """
     station_data: Dict[str, Optional[str]] = {}
     reading_data: Dict[str, Optional[object]] = {}
@@ -1,20 +1,24 @@
 """
 Selectors configuration for the national water quality scraper.
 
-Pydantic models are used so that any missing or malformed selector simply
-raises a validation error, making it easier to spot typos early. Replace the
-placeholder values below with the actual selectors once you confirm them in
-Chrome DevTools.
+Frozen dataclasses keep the configuration immutable and cheap to build; the
+few invariants (stripped selectors, a known scroll mode) are checked in
+`__post_init__`. Replace the placeholder values below with the actual
+selectors once you confirm them in Chrome DevTools.
 """
 
-from typing import Dict, List, Literal, Optional
-
-from pydantic import BaseModel, Field, validator
+from dataclasses import dataclass, field
+from functools import lru_cache
+from types import MappingProxyType
+from typing import List, Literal, Mapping, Optional, Tuple
 
 ScrollMode = Literal["none", "infinite_scroll", "load_more"]
 
+_SCROLL_MODES = frozenset({"none", "infinite_scroll", "load_more"})
+
 
-class TableSelectors(BaseModel):
+@dataclass(frozen=True, slots=True)
+class TableSelectors:
     """
     Selectors used to isolate the data table.
 
@@ -23,36 +27,30 @@ class TableSelectors(BaseModel):
     attributes over brittle `nth-child` selectors when possible).
     """
 
-    table_container: str = Field(
-        "div.table-container-placeholder",
-        description="CSS selector that wraps both headers and rows.",
-    )
-    header_cells: str = Field(
-        "table thead tr th",
-        description="Selector that matches the header cells; text is used for column mapping.",
-    )
-    data_rows: str = Field(
-        "table tbody tr",
-        description="Selector that returns each data row element.",
-    )
-    cell_selector: Optional[str] = Field(
-        default="td",
-        description="Selector for cells inside a row when each column shares the same structure.",
-    )
-    column_overrides: Dict[str, str] = Field(
-        default_factory=dict,
-        description="Optional per-header overrides when certain cells require special selectors.",
-    )
-
-    @validator("table_container", "header_cells", "data_rows", pre=True, always=True)
-    def _strip_strings(cls, value: str) -> str:
-        """Normalize accidental whitespace in selector definitions."""
-        if isinstance(value, str):
-            return value.strip()
-        return value
-
-
-class ScrollSettings(BaseModel):
+    # CSS selector that wraps both headers and rows.
+    table_container: str = "div.table-container-placeholder"
+    # Selector that matches the header cells; text is used for column mapping.
+    header_cells: str = "table thead tr th"
+    # Selector that returns each data row element.
+    data_rows: str = "table tbody tr"
+    # Selector for cells inside a row when each column shares the same structure.
+    cell_selector: Optional[str] = "td"
+    # Optional per-header overrides when certain cells require special selectors.
+    # Stored as a read-only mapping; excluded from hashing so the frozen
+    # dataclass stays hashable.
+    column_overrides: Mapping[str, str] = field(default_factory=dict, hash=False)
+
+    def __post_init__(self) -> None:
+        # Normalize accidental whitespace in selector definitions.
+        for name in ("table_container", "header_cells", "data_rows"):
+            value = getattr(self, name)
+            if isinstance(value, str):
+                object.__setattr__(self, name, value.strip())
+        object.__setattr__(self, "column_overrides", MappingProxyType(dict(self.column_overrides)))
+
+
+@dataclass(frozen=True, slots=True)
+class ScrollSettings:
     """
     Pagination controls for infinite scroll or click-to-load pages.
 
@@ -61,29 +59,26 @@ class ScrollSettings(BaseModel):
     scrollable container (use 'body' if the entire page scrolls).
     """
 
-    mode: ScrollMode = Field(
-        "none",
-        description="Pagination mode: 'none', 'infinite_scroll', or 'load_more'.",
-    )
-    container: Optional[str] = Field(
-        default=None,
-        description="Scrollable element selector used for infinite scroll (optional for load-more).",
-    )
-    load_more_button: Optional[str] = Field(
-        default=None,
-        description="Button selector that triggers additional rows when mode='load_more'.",
-    )
-    max_iterations: int = Field(
-        10,
-        description="Safety cap to prevent endless scroll loops.",
-    )
-    wait_for_ms: int = Field(
-        800,
-        description="Delay between scroll/load actions to allow the table to settle.",
-    )
-
-
-class PageSelectors(BaseModel):
+    # Pagination mode: 'none', 'infinite_scroll', or 'load_more'.
+    mode: ScrollMode = "none"
+    # Scrollable element selector used for infinite scroll (optional for load-more).
+    container: Optional[str] = None
+    # Button selector that triggers additional rows when mode='load_more'.
+    load_more_button: Optional[str] = None
+    # Safety cap to prevent endless scroll loops.
+    max_iterations: int = 10
+    # Delay between scroll/load actions to allow the table to settle.
+    wait_for_ms: int = 800
+    # Selector counted after each scroll/load action to detect newly loaded rows.
+    row_selector: str = "#gridDatas li"
+
+    def __post_init__(self) -> None:
+        if self.mode not in _SCROLL_MODES:
+            raise ValueError(f"unknown scroll mode: {self.mode!r}")
+
+
+@dataclass(frozen=True, slots=True)
+class PageSelectors:
     """
     Top-level selectors for a single page harvest.
 
@@ -92,28 +87,28 @@ class PageSelectors(BaseModel):
     url:
         Page URL to visit. Must be reachable without authentication.
     iframe_chain:
-        Ordered list of selectors the scraper uses to enter nested iframes.
-        Leave empty when the table is in the top-level document.
+        Ordered tuple of selectors the scraper uses to enter nested iframes
+        (outermost first). Leave empty when the table is in the top-level
+        document.
     table:
         `TableSelectors` instance describing the core table structure.
     scroll:
         Optional `ScrollSettings` instance configuring pagination.
     """
 
-    url: str = Field("https://szzdjc.cnemc.cn:8070/GJZ/Business/Publish/Main.html", description="Target page URL.")
-    iframe_chain: List[str] = Field(
-        default_factory=list,
-        description="Selectors for nested iframes (outermost first).",
-    )
-    table: TableSelectors = Field(default_factory=TableSelectors)
-    scroll: ScrollSettings = Field(default_factory=ScrollSettings)
+    url: str = "https://szzdjc.cnemc.cn:8070/GJZ/Business/Publish/Main.html"
+    iframe_chain: Tuple[str, ...] = ()
+    table: TableSelectors = field(default_factory=TableSelectors)
+    scroll: ScrollSettings = field(default_factory=ScrollSettings)
 
 
+@lru_cache(maxsize=1)
 def get_default_page() -> PageSelectors:
     """
     Template selector set to be replaced with real values.
 
     Returns a configuration object describing how to reach the data table.
+    The result is built once and shared; it is frozen, so that is safe.
     """
     """
     Construct a page configuration with selectors tuned for the national water quality
@@ -128,9 +123,9 @@ def get_default_page() -> PageSelectors:
         # Landing page for the realtime data system
         url="https://szzdjc.cnemc.cn:8070/GJZ/Business/Publish/Main.html",
         # Enter the top-level data iframe before selecting elements
-        iframe_chain=[
+        iframe_chain=(
             "#MF",
-        ],
+        ),
         # Table structure definitions
         table=TableSelectors(
             table_container="body",
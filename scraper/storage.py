@@ -5,23 +5,48 @@ Two tables are defined:
     - stations: static metadata about monitoring stations.
     - readings: time-series measurements for each station.
 
-`upsert_reading` ensures idempotency by de-duplicating on (station_id, observed_at).
+`upsert_station` resolves against a session-scoped `StationCache`;
+`upsert_reading` ensures idempotency by de-duplicating on (station_id, observed_at);
+`bulk_upsert_readings` applies the same rule to whole batches at once.
 """
 
 from __future__ import annotations
 
-import json
+import heapq
 import os
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, Optional, Tuple
-
-from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, UniqueConstraint, create_engine
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session, declarative_base, relationship, sessionmaker
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import orjson
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+    create_engine,
+    event,
+    func,
+    select,
+    tuple_,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import MultipleResultsFound
+from sqlalchemy.orm import Session, declarative_base, make_transient_to_detached, relationship, sessionmaker
+from sqlalchemy.pool import StaticPool
 
 Base = declarative_base()
 
+# Conservative bound-parameter limit for SQLite builds predating 3.32.
+_SQLITE_MAX_VARIABLES = 999
+
+# Bytes of the database file SQLite may memory-map (256 MB).
+SQLITE_MMAP_SIZE = 268_435_456
+
 
 class Station(Base):
     __tablename__ = "stations"
@@ -45,6 +70,9 @@ class Station(Base):
             "station_name",
             name="uq_station_composite",
         ),
+        Index("ix_station_fuzzy", "province", "basin", "river", "station_name"),
+        # 网页端下拉筛选的常用组合
+        Index("ix_station_pbc", "province", "basin", "city"),
     )
 
 
@@ -61,104 +89,258 @@ class Reading(Base):
 
     __table_args__ = (
         Index("ix_unique_reading", "station_id", "observed_at", unique=True),
+        # 网页端按 (observed_at, id) 倒序做游标分页
+        Index("ix_reading_observed_id", observed_at.desc(), id.desc()),
     )
 
 
-def get_engine(database_path: str):
-    """Create a SQLite engine, ensuring the parent directory is available."""
+def get_engine(database_path: str, single_writer: bool = False):
+    """
+    Create a SQLite engine, ensuring the parent directory is available.
+
+    `single_writer` suits the scraper: one connection is shared through a
+    StaticPool, and pysqlite's implicit BEGIN is disabled in favour of an
+    explicit BEGIN when each session transaction starts, so a whole batch
+    (reads included) runs in one deferred transaction.
+    """
+    if database_path == ":memory:":
+        return create_engine("sqlite://", future=True)
+
     os.makedirs(os.path.dirname(database_path), exist_ok=True)
-    return create_engine(f"sqlite:///{database_path}", future=True)
+    options: Dict[str, object] = {}
+    if single_writer:
+        options = {
+            "poolclass": StaticPool,
+            "connect_args": {"check_same_thread": False, "isolation_level": None},
+        }
+    engine = create_engine(f"sqlite:///{database_path}", future=True, **options)
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    if single_writer:
+        event.listen(engine, "begin", _begin_transaction)
+    return engine
+
+
+def _begin_transaction(connection) -> None:
+    connection.exec_driver_sql("BEGIN")
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    Tune each new SQLite connection for the scraper's write-heavy batches.
+
+    WAL lets the web UI keep reading while a scrape commits, and
+    synchronous=NORMAL only fsyncs at checkpoints instead of on every commit.
+    Larger pages suit the append-mostly readings table, and memory-mapped I/O
+    saves a read() syscall per page on scans.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA page_count")
+        if cursor.fetchone()[0] == 0:
+            # page_size is fixed once the file has content (and WAL mode
+            # prevents changing it later), so only new databases get it.
+            cursor.execute("PRAGMA page_size=8192")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-65536")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    finally:
+        cursor.close()
 
 
 def get_session_factory(database_path: str):
-    engine = get_engine(database_path)
+    engine = get_engine(database_path, single_writer=True)
     Base.metadata.create_all(engine)
-    return sessionmaker(bind=engine, expire_on_commit=False, class_=Session)
+    _ensure_indexes(engine)
+    factory = sessionmaker(bind=engine, expire_on_commit=False, class_=Session)
+    # soft rollback 也包括回滚到保存点（抓取重试时整页回退）
+    event.listen(factory, "after_soft_rollback", _drop_station_cache)
+    return factory
 
 
-@dataclass
+def _ensure_indexes(engine) -> None:
+    """Create indexes added after a database was first built; create_all skips existing tables."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+@dataclass(slots=True)
 class UpsertResult:
     station: Station
     reading: Optional[Reading]
     created: bool
 
 
-def _json_ready_payload(payload: Dict[str, Optional[object]]) -> Dict[str, Optional[object]]:
-    """
-    Convert payload values into JSON-serializable primitives.
+_COMPOSITE_FIELDS = ("province", "city", "basin", "river", "station_name")
+_FUZZY_FIELDS = ("province", "basin", "river", "station_name")
+
 
-    Datetime objects are rendered as ISO8601 strings so that they can be stored
-    inside the readings payload column without serialization errors.
+def _station_key(values, fields: Tuple[str, ...]) -> Tuple[Optional[str], ...]:
+    if isinstance(values, dict):
+        return tuple(values.get(name) for name in fields)
+    return tuple(getattr(values, name) for name in fields)
+
+
+class StationCache:
     """
-    prepared: Dict[str, Optional[object]] = {}
-    for key, value in payload.items():
-        if isinstance(value, datetime):
-            prepared[key] = value.isoformat()
-        else:
-            prepared[key] = value
-    return prepared
+    Session-scoped index of every station, loaded with one SELECT.
 
+    Lookups mirror the SQL equality used before (None matches NULL), so
+    `upsert_station` resolves rows without per-row queries. Stations must be
+    re-indexed whenever their key columns change.
+    """
 
-def upsert_station(session: Session, station_data: Dict[str, Optional[str]]) -> Station:
+    def __init__(self, stations: Sequence[Station] = ()):
+        self.by_code: Dict[str, Station] = {}
+        self.by_composite: Dict[Tuple[Optional[str], ...], List[Station]] = {}
+        self.by_fuzzy: Dict[Tuple[Optional[str], ...], List[Station]] = {}
+        for station in stations:
+            self.add(station)
+
+    def add(self, station: Station) -> None:
+        if station.station_code:
+            self.by_code[station.station_code] = station
+        self.by_composite.setdefault(_station_key(station, _COMPOSITE_FIELDS), []).append(station)
+        self.by_fuzzy.setdefault(_station_key(station, _FUZZY_FIELDS), []).append(station)
+
+    def discard(self, station: Station) -> None:
+        if station.station_code and self.by_code.get(station.station_code) is station:
+            del self.by_code[station.station_code]
+        for index, fields in ((self.by_composite, _COMPOSITE_FIELDS), (self.by_fuzzy, _FUZZY_FIELDS)):
+            key = _station_key(station, fields)
+            bucket = index.get(key, [])
+            if station in bucket:
+                bucket.remove(station)
+                if not bucket:
+                    del index[key]
+
+    def find_composite(self, station_data: Dict[str, Optional[str]]) -> Optional[Station]:
+        matches = self.by_composite.get(_station_key(station_data, _COMPOSITE_FIELDS), [])
+        if len(matches) > 1:
+            raise MultipleResultsFound("Multiple stations share the composite key")
+        return matches[0] if matches else None
+
+    def fuzzy_candidates(self, station_data: Dict[str, Optional[str]]) -> List[Station]:
+        return list(self.by_fuzzy.get(_station_key(station_data, _FUZZY_FIELDS), []))
+
+
+def _station_cache(session: Session) -> StationCache:
+    """Return the session's station cache, loading all stations on first use."""
+    cache = session.info.get("station_cache")
+    if cache is None:
+        cache = StationCache(session.execute(select(Station).order_by(Station.id)).scalars().all())
+        session.info["station_cache"] = cache
+    return cache
+
+
+def _drop_station_cache(session: Session, *args) -> None:
+    # 回滚后新建的站点和修改都已失效，下次使用时重新加载
+    session.info.pop("station_cache", None)
+
+
+def upsert_station(
+    session: Session,
+    station_data: Dict[str, Optional[str]],
+    new_stations: Optional[List[Station]] = None,
+) -> Station:
     """
     Find or create a station record based on station_code when available,
     otherwise falling back to the composite unique constraint.
+
+    New stations are added to the session, or, when `new_stations` is given,
+    collected there (still transient) for `insert_new_stations`.
     """
+    cache = _station_cache(session)
     station_code = station_data.get("station_code")
-    query = session.query(Station)
     if station_code:
-        instance = query.filter(Station.station_code == station_code).one_or_none()
+        instance = cache.by_code.get(station_code)
         if instance:
-            _merge_station_values(instance, station_data)
+            _merge_cached_station(cache, instance, station_data)
             return instance
 
-    filters = {
-        "province": station_data.get("province"),
-        "city": station_data.get("city"),
-        "basin": station_data.get("basin"),
-        "river": station_data.get("river"),
-        "station_name": station_data.get("station_name"),
-    }
-    instance = query.filter_by(**filters).one_or_none()
+    instance = cache.find_composite(station_data)
     if instance:
-        _merge_station_values(instance, station_data)
+        _merge_cached_station(cache, instance, station_data)
         return instance
 
     # API fallback: city metadata can be missing in one run and available in a
     # later run. Reuse a unique fuzzy match to avoid duplicate station rows.
-    fuzzy = _find_station_fuzzy_candidate(query, station_data)
+    fuzzy = _pick_fuzzy_candidate(cache.fuzzy_candidates(station_data), station_data)
     if fuzzy:
-        _merge_station_values(fuzzy, station_data)
+        _merge_cached_station(cache, fuzzy, station_data)
         return fuzzy
 
     instance = Station(**station_data)
-    session.add(instance)
+    if new_stations is None:
+        session.add(instance)
+    else:
+        new_stations.append(instance)
+    cache.add(instance)
     return instance
 
 
+def insert_new_stations(session: Session, stations: Sequence[Station]) -> None:
+    """
+    Write transient stations with one Core executemany INSERT.
+
+    The assigned ids are read back in insertion order (SQLite hands out
+    increasing rowids) and the objects are attached to the session as
+    persistent, so the ORM never flushes an INSERT for them.
+    """
+    if not stations:
+        return
+    table = Station.__table__
+    columns = [column.key for column in table.columns if column.key != "id"]
+    last_id = session.execute(select(func.max(table.c.id))).scalar() or 0
+    session.execute(table.insert(), [{name: getattr(station, name) for name in columns} for station in stations])
+    ids = session.execute(select(table.c.id).where(table.c.id > last_id).order_by(table.c.id)).scalars().all()
+    if len(ids) != len(stations):
+        raise RuntimeError(f"Expected {len(stations)} new station ids, found {len(ids)}")
+    for station, station_id in zip(stations, ids):
+        station.id = station_id
+        make_transient_to_detached(station)
+        session.add(station)
+
+
+def _merge_cached_station(cache: StationCache, instance: Station, station_data: Dict[str, Optional[str]]) -> None:
+    changes = _station_changes(instance, station_data)
+    if not changes:
+        # 绝大多数命中没有任何变化：不触碰 ORM 状态，也无需重建索引
+        return
+    cache.discard(instance)
+    for key, value in changes.items():
+        setattr(instance, key, value)
+    cache.add(instance)
+
+
 def _is_blank(value: Optional[str]) -> bool:
-    return value is None or (isinstance(value, str) and value.strip() == "")
+    # "" or str.isspace() counts as blank; neither allocates a new string.
+    return value is None or (isinstance(value, str) and (not value or value.isspace()))
 
 
-def _merge_station_values(instance: Station, station_data: Dict[str, Optional[str]]) -> None:
+def _station_changes(instance: Station, station_data: Dict[str, Optional[str]]) -> Dict[str, str]:
     """
-    Update station fields without overwriting existing non-empty values with blanks.
+    Return the station fields that would change, never overwriting existing
+    non-empty values with blanks.
     """
-    for key, value in station_data.items():
-        if _is_blank(value):
-            continue
-        setattr(instance, key, value)
+    return {
+        key: value
+        for key, value in station_data.items()
+        if not _is_blank(value) and getattr(instance, key, None) != value
+    }
 
 
-def _find_station_fuzzy_candidate(query, station_data: Dict[str, Optional[str]]) -> Optional[Station]:
-    candidates = (
-        query.filter(
-            Station.province == station_data.get("province"),
-            Station.basin == station_data.get("basin"),
-            Station.river == station_data.get("river"),
-            Station.station_name == station_data.get("station_name"),
-        ).all()
-    )
+def _pick_fuzzy_candidate(candidates: List[Station], station_data: Dict[str, Optional[str]]) -> Optional[Station]:
+    """
+    Return the single best fuzzy match, or None when the match is ambiguous.
+
+    With a known city, a unique exact-city station wins, else a unique
+    city-less one (only when no exact match exists). Without a city, a unique
+    station that has one wins. Candidates are ranked once and only the top two
+    are compared, like ORDER BY CASE ... LIMIT 2.
+    """
     if not candidates:
         return None
     if len(candidates) == 1:
@@ -166,17 +348,22 @@ def _find_station_fuzzy_candidate(query, station_data: Dict[str, Optional[str]])
 
     target_city = station_data.get("city")
     if not _is_blank(target_city):
-        exact = [item for item in candidates if not _is_blank(item.city) and item.city == target_city]
-        if len(exact) == 1:
-            return exact[0]
-        blanks = [item for item in candidates if _is_blank(item.city)]
-        if len(blanks) == 1 and len(exact) == 0:
-            return blanks[0]
-        return None
 
-    non_blank = [item for item in candidates if not _is_blank(item.city)]
-    if len(non_blank) == 1:
-        return non_blank[0]
+        def rank(item: Station) -> int:
+            return 0 if item.city == target_city else 1 if _is_blank(item.city) else 2
+
+        accept = (0, 1)
+    else:
+
+        def rank(item: Station) -> int:
+            return 1 if _is_blank(item.city) else 0
+
+        accept = (0,)
+
+    best, runner_up = heapq.nsmallest(2, candidates, key=rank)
+    best_rank = rank(best)
+    if best_rank in accept and rank(runner_up) != best_rank:
+        return best
     return None
 
 
@@ -189,44 +376,23 @@ def upsert_reading(
     """
     Insert or update a reading for the given station.
 
-    Returns None if the row already exists and no update was required.
+    Goes through the same `INSERT ... ON CONFLICT DO UPDATE` as
+    `bulk_upsert_readings`. Returns (None, False) when the payload has no
+    observed_at timestamp.
     """
-    observed_at = reading_payload.get("observed_at")
-    if observed_at is None:
+    if station.id is None:
+        session.flush()
+    row = reading_row(station, reading_payload, batch_time)
+    if row is None:
         return None, False
 
-    payload_copy = dict(reading_payload)
-    payload_copy["batch_time"] = batch_time.isoformat()
-    payload_copy = _json_ready_payload(payload_copy)
-
-    existing = (
-        session.query(Reading)
-        .filter(Reading.station_id == station.id, Reading.observed_at == observed_at)
-        .one_or_none()
-    )
-
-    if existing:
-        existing.batch_time = batch_time
-        existing.payload = json.dumps(payload_copy, ensure_ascii=False)
-        return existing, False
-
-    reading = Reading(
-        station=station,
-        observed_at=observed_at,
-        batch_time=batch_time,
-        payload=json.dumps(payload_copy, ensure_ascii=False),
-    )
-    session.add(reading)
-    try:
-        session.flush()
-    except IntegrityError:
-        session.rollback()
-        return (
-            session.query(Reading)
-            .filter(Reading.station_id == station.id, Reading.observed_at == observed_at)
-            .one_or_none()
-        ), False
-    return reading, True
+    created = bulk_upsert_readings(session, [row]) == 1
+    reading = session.execute(
+        select(Reading)
+        .where(Reading.station_id == station.id, Reading.observed_at == row["observed_at"])
+        .execution_options(populate_existing=True)
+    ).scalar_one()
+    return reading, created
 
 
 def upsert_row(
@@ -239,3 +405,104 @@ def upsert_row(
     station = upsert_station(session, station_data)
     reading, created = upsert_reading(session, station, reading_payload, batch_time)
     return UpsertResult(station=station, reading=reading, created=created)
+
+
+def reading_row(
+    station: Station,
+    reading_payload: Dict[str, Optional[object]],
+    batch_time: datetime,
+) -> Optional[Dict[str, object]]:
+    """
+    Build a `bulk_upsert_readings` row for the given station.
+
+    The station must already be flushed so that its primary key is known.
+    `reading_payload` gains a `batch_time` entry. Returns None when the
+    payload has no observed_at timestamp.
+    """
+    observed_at = reading_payload.get("observed_at")
+    if observed_at is None:
+        return None
+
+    # Stamped in place: payloads are built per row by the parser and not
+    # reused, so copying the dict first would only cost an allocation.
+    reading_payload["batch_time"] = batch_time.isoformat()
+    return {
+        "station_id": station.id,
+        "observed_at": observed_at,
+        "batch_time": batch_time,
+        # orjson renders datetimes as ISO 8601 itself and emits UTF-8 directly.
+        "payload": orjson.dumps(reading_payload).decode("utf-8"),
+    }
+
+
+def bulk_upsert_readings(session: Session, rows: Sequence[Dict[str, object]]) -> int:
+    """
+    Insert or update many readings inside the session's current transaction.
+
+    Rows are de-duplicated on (station_id, observed_at), keeping the last
+    occurrence, sorted by that key for index locality and written with
+    multi-row `INSERT ... ON CONFLICT DO UPDATE` statements. Returns the
+    number of readings that did not exist before.
+    """
+    unique: Dict[Tuple[object, object], Dict[str, object]] = {}
+    for row in rows:
+        unique[(row["station_id"], row["observed_at"])] = row
+    if not unique:
+        return 0
+
+    ordered = [unique[key] for key in sorted(unique)]
+    table = Reading.__table__
+    chunk_size = _SQLITE_MAX_VARIABLES // len(ordered[0])
+    created = 0
+    for start in range(0, len(ordered), chunk_size):
+        chunk: List[Dict[str, object]] = ordered[start : start + chunk_size]
+        keys = [(row["station_id"], row["observed_at"]) for row in chunk]
+        existing = session.execute(
+            select(func.count())
+            .select_from(table)
+            .where(tuple_(table.c.station_id, table.c.observed_at).in_(keys))
+        ).scalar_one()
+        stmt = sqlite_insert(table).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.station_id, table.c.observed_at],
+            set_={"batch_time": stmt.excluded.batch_time, "payload": stmt.excluded.payload},
+        )
+        session.execute(stmt)
+        created += len(chunk) - existing
+    return created
+
+
+def upsert_rows_bulk(
+    session: Session,
+    stations: Sequence[Dict[str, Optional[str]]],
+    readings: Sequence[Dict[str, Optional[object]]],
+    batch_time: datetime,
+) -> int:
+    """
+    Persist a batch of parsed rows; `stations[i]` belongs to `readings[i]`.
+
+    Each distinct station payload is resolved once per batch, new stations are
+    written with one `insert_new_stations` executemany, and the readings go
+    through `bulk_upsert_readings`. Returns the number of readings that did
+    not exist before.
+    """
+    resolved: Dict[Tuple[Tuple[str, Optional[str]], ...], Station] = {}
+    new_stations: List[Station] = []
+    rows: List[Dict[str, object]] = []
+    pending: List[Tuple[Station, Dict[str, Optional[object]]]] = []
+    for station_data, reading_payload in zip(stations, readings):
+        key = tuple(sorted(station_data.items()))
+        station = resolved.get(key)
+        if station is None:
+            station = upsert_station(session, station_data, new_stations)
+            resolved[key] = station
+        pending.append((station, reading_payload))
+
+    # Updates to existing stations go through the ORM; new ones bypass it.
+    session.flush()
+    insert_new_stations(session, new_stations)
+    for station, reading_payload in pending:
+        row = reading_row(station, reading_payload, batch_time)
+        if row is not None:
+            rows.append(row)
+    return bulk_upsert_readings(session, rows)
@@ -1,22 +1,28 @@
 from __future__ import annotations
 
-import json
+import base64
+import binascii
 from datetime import datetime, time
+from functools import lru_cache
 import csv
 import io
 import math
+import os
 from pathlib import Path
-from typing import Dict, List, Optional
+from time import monotonic
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
 from urllib.parse import urlencode
 
+import jinja2
+import numpy as np
+import orjson
 from fastapi import FastAPI, Query, Request
 from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy import Float, Select, cast, func, select
+from sqlalchemy import Float, Select, bindparam, case, cast, func, select, tuple_
 from sqlalchemy.orm import Session
 
 from scraper.job import load_settings
-from scraper.parser import parse_numeric
 from scraper.storage import Reading, Station, get_engine
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
@@ -25,7 +31,34 @@ SETTINGS = load_settings(SETTINGS_PATH)
 DB_PATH = PROJECT_ROOT / SETTINGS.get("database_path", "data/water_quality.db")
 ENGINE = get_engine(str(DB_PATH))
 
-templates = Jinja2Templates(directory=str(Path(__file__).parent / "templates"))
+TEMPLATE_DIR = Path(__file__).parent / "templates"
+# 字节码缓存目录可用 WATER_JINJA_CACHE_DIR 指定，默认放在项目根目录下
+TEMPLATE_CACHE_DIR = Path(
+    os.environ.get("WATER_JINJA_CACHE_DIR") or PROJECT_ROOT / ".jinja_cache"
+)
+
+
+def _template_bytecode_cache() -> Optional[jinja2.BytecodeCache]:
+    # 只读部署时目录建不了或写不进去，退回不落盘缓存，不影响服务启动
+    try:
+        TEMPLATE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return None
+    if not os.access(TEMPLATE_CACHE_DIR, os.W_OK | os.X_OK):
+        return None
+    return jinja2.FileSystemBytecodeCache(str(TEMPLATE_CACHE_DIR))
+
+
+# 模板在进程内只编译一次（auto_reload=False，改模板后需重启服务），
+# 编译结果再落到磁盘字节码缓存（可写时），重启后也不用重新解析
+templates = Jinja2Templates(
+    env=jinja2.Environment(
+        loader=jinja2.FileSystemLoader(str(TEMPLATE_DIR)),
+        autoescape=True,
+        auto_reload=False,
+        bytecode_cache=_template_bytecode_cache(),
+    )
+)
 app = FastAPI(title="Water Quality Browser")
 
 DISPLAY_METRICS = [
@@ -44,19 +77,82 @@ DISPLAY_METRICS = [
     ("station_status", "站点情况"),
 ]
 
+_METRIC_KEYS = tuple(key for key, _ in DISPLAY_METRICS)
+
 NUMERIC_METRICS = [
     item for item in DISPLAY_METRICS if item[0] not in {"water_quality_class", "station_status"}
 ]
 
 PAGE_SIZE_OPTIONS = [50, 100, 200, 500]
 EXPORT_LIMIT = 5000
+EXPORT_BATCH_SIZE = 500
 SERIES_LIMIT = 400
 WATER_QUALITY_CLASSES = ["Ⅰ", "Ⅱ", "Ⅲ", "Ⅳ", "Ⅴ", "劣Ⅴ"]
 
+FILTER_OPTIONS_TTL = 300
+TOTAL_ROWS_TTL = 60
+
+
+class _TTLCache:
+    """Tiny expiring memo for values that only change after a scrape run."""
+
+    def __init__(self, ttl: float) -> None:
+        self._ttl = ttl
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        now = monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        value = loader()
+        self._entries[key] = (now + self._ttl, value)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# 下拉框选项只在抓取后才会变化，缓存几分钟即可省掉每次请求的 DISTINCT 查询
+_FILTER_OPTIONS_CACHE = _TTLCache(FILTER_OPTIONS_TTL)
+# 无筛选时的总行数，一分钟内可以略有滞后
+_TOTAL_ROWS_CACHE = _TTLCache(TOTAL_ROWS_TTL)
+
+
+# 下拉框与计数用的固定语句在导入时构造一次，省去每次请求重新拼装
+_PROVINCES_STMT = (
+    select(Station.province)
+    .where(Station.province.isnot(None), Station.province != "")
+    .distinct()
+    .order_by(Station.province)
+)
+_BASINS_STMT = (
+    select(Station.basin)
+    .where(Station.basin.isnot(None), Station.basin != "")
+    .distinct()
+    .order_by(Station.basin)
+)
+_CITIES_STMT = (
+    select(Station.city)
+    .where(Station.city.isnot(None), Station.city != "")
+    .distinct()
+    .order_by(Station.city)
+)
+_CITIES_BY_PROVINCE_STMT = _CITIES_STMT.where(Station.province == bindparam("province"))
+# readings.station_id 非空且有外键，整表行数即等于联表后的行数
+_TOTAL_ROWS_STMT = select(func.count()).select_from(Reading)
+_COUNT_STMT = (
+    select(func.count())
+    .select_from(Reading)
+    .join(Station, Reading.station_id == Station.id)
+)
+
+
 def _open_session() -> Session:
     return Session(ENGINE)
 
 
+@lru_cache(maxsize=1024)
 def _parse_date(value: Optional[str], default_time: time) -> Optional[datetime]:
     if not value:
         return None
@@ -69,28 +165,53 @@ def _parse_date(value: Optional[str], default_time: time) -> Optional[datetime]:
 
 def _prepare_rows(result_rows) -> List[Dict[str, object]]:
     prepared: List[Dict[str, object]] = []
-    for province, city, basin, station_name, observed_at, payload_text in result_rows:
-        try:
-            payload = json.loads(payload_text) if payload_text else {}
-        except json.JSONDecodeError:
-            payload = {}
-
-        metrics = {key: payload.get(key) for key, _ in DISPLAY_METRICS}
+    metric_keys = _METRIC_KEYS
+    isoformat = datetime.isoformat
+    # 按 _base_select 的列顺序解包，指标列之后可能还跟着 total_count，由 zip 截掉
+    for province, city, basin, station_name, observed_at, _, *metric_values in result_rows:
         prepared.append(
             {
                 "province": province or "",
                 "city": city or "",
                 "basin": basin or "",
                 "station_name": station_name,
-                "observed_at": observed_at.strftime("%Y-%m-%d %H:%M")
-                if observed_at
-                else "",
-                "metrics": metrics,
+                "observed_at": isoformat(observed_at, " ", "minutes") if observed_at else "",
+                "metrics": dict(zip(metric_keys, metric_values)),
             }
         )
     return prepared
 
 
+def _encode_cursor(observed_at: datetime, reading_id: int) -> str:
+    raw = f"{observed_at.isoformat()}|{reading_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(value: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    if not value:
+        return None
+    try:
+        observed_at, reading_id = base64.urlsafe_b64decode(value).decode("utf-8").split("|")
+        return datetime.fromisoformat(observed_at), int(reading_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def _prepare_rows_flat(result_rows) -> Iterator[tuple]:
+    """Yield export rows as flat tuples in CSV column order, without the per-row dicts."""
+    isoformat = datetime.isoformat
+    metric_count = len(_METRIC_KEYS)
+    for province, city, basin, station_name, observed_at, _, *metric_values in result_rows:
+        yield (
+            province or "",
+            city or "",
+            basin or "",
+            station_name,
+            isoformat(observed_at, " ", "minutes") if observed_at else "",
+            *metric_values[:metric_count],
+        )
+
+
 def _build_conditions(
     province: Optional[str],
     basin: Optional[str],
@@ -132,6 +253,7 @@ def _build_conditions(
     return conditions
 
 
+@lru_cache(maxsize=1024)
 def _parse_float(value: Optional[str]) -> Optional[float]:
     if value in (None, "", " "):
         return None
@@ -141,14 +263,18 @@ def _parse_float(value: Optional[str]) -> Optional[float]:
         return None
 
 
+@lru_cache(maxsize=1)
 def _base_select() -> Select:
+    # Select 是不可变的，.where()/.order_by() 都返回新对象，骨架语句构造一次即可复用
     return select(
         Station.province,
         Station.city,
         Station.basin,
         Station.station_name,
         Reading.observed_at,
-        Reading.payload,
+        Reading.id.label("reading_id"),
+        # 指标直接由 SQLite 的 json_extract 取出，不再把整段 payload 传回 Python 解析
+        *(func.json_extract(Reading.payload, f"$.{key}").label(key) for key in _METRIC_KEYS),
     ).join(Reading, Reading.station_id == Station.id)
 
 
@@ -162,57 +288,109 @@ def _build_query_params(params: Dict[str, Optional[object]]) -> str:
 
 
 def _collect_filter_options(session: Session):
-    provinces = [
-        row[0]
-        for row in session.execute(
-            select(Station.province)
-            .where(Station.province.isnot(None), Station.province != "")
-            .distinct()
-            .order_by(Station.province)
-        )
-        if row[0]
-    ]
-    basins = [
-        row[0]
-        for row in session.execute(
-            select(Station.basin)
-            .where(Station.basin.isnot(None), Station.basin != "")
-            .distinct()
-            .order_by(Station.basin)
-        )
-        if row[0]
-    ]
+    return _FILTER_OPTIONS_CACHE.get_or_load(
+        ("options",), lambda: _query_filter_options(session)
+    )
+
+
+def _query_filter_options(session: Session):
+    provinces = [row[0] for row in session.execute(_PROVINCES_STMT) if row[0]]
+    basins = [row[0] for row in session.execute(_BASINS_STMT) if row[0]]
     return provinces, basins
 
 
-def _collect_cities(session: Session, province: Optional[str] = None) -> List[str]:
-    query = select(Station.city).where(Station.city.isnot(None), Station.city != "")
+def _collect_cities(
+    session: Session, provinces: Sequence[str], province: Optional[str] = None
+) -> List[str]:
+    # province 来自查询参数，只缓存 provinces（库里存在的省份）之内的取值，
+    # 其它取值直接查询，避免缓存无限增长
+    if province and province not in provinces:
+        return _query_cities(session, province)
+    return _FILTER_OPTIONS_CACHE.get_or_load(
+        ("cities", province or None), lambda: _query_cities(session, province)
+    )
+
+
+def _query_cities(session: Session, province: Optional[str]) -> List[str]:
     if province:
-        query = query.where(Station.province == province)
-    rows = session.execute(query.distinct().order_by(Station.city)).all()
+        rows = session.execute(_CITIES_BY_PROVINCE_STMT, {"province": province}).all()
+    else:
+        rows = session.execute(_CITIES_STMT).all()
     return [row[0] for row in rows if row[0]]
 
 
 def _compute_class_distribution(session: Session, conditions):
-    json_path = "$.water_quality_class"
+    water_class = func.json_extract(Reading.payload, "$.water_quality_class")
+    # 类别排序与有效总数都在 SQLite 里算好：CASE 给出固定顺序，窗口 SUM 汇总非空类别
+    order_case = case(
+        {name: idx for idx, name in enumerate(WATER_QUALITY_CLASSES)},
+        value=func.trim(water_class),
+        else_=len(WATER_QUALITY_CLASSES),
+    )
+    classified_total = func.sum(
+        case((func.coalesce(water_class, "") != "", func.count()), else_=0)
+    ).over()
     stmt = (
-        select(func.json_extract(Reading.payload, json_path).label("cls"), func.count())
+        select(water_class.label("cls"), func.count(), classified_total)
         .join(Station, Reading.station_id == Station.id)
         .where(*conditions)
         .group_by("cls")
+        .order_by(order_case, "cls")
     )
     rows = session.execute(stmt).all()
-    total = sum(row[1] for row in rows if row[0])
+    total = rows[0][2] if rows else 0
     distribution = []
-    for label, count in rows:
+    for label, count, _ in rows:
         name = (label or "其它").strip()
         percent = 0 if total == 0 else round(count / total * 100, 1)
         distribution.append({"label": name, "value": count, "percent": percent})
-    order_map = {name: idx for idx, name in enumerate(WATER_QUALITY_CLASSES)}
-    distribution.sort(key=lambda item: order_map.get(item["label"], 999))
     return distribution, total
 
 
+def _fetch_index_page(
+    session: Session, conditions, page: int, page_size: int, cursor: Optional[str]
+) -> Tuple[list, int, int]:
+    """Return the rows of one index page with the filtered total and the effective page number."""
+    data_stmt = (
+        _base_select()
+        .where(*conditions)
+        .order_by(Reading.observed_at.desc(), Reading.id.desc())
+        .limit(page_size)
+    )
+    if conditions:
+        # 总数由窗口函数随数据一起返回，省掉一次同条件的 COUNT 查询
+        data_stmt = data_stmt.add_columns(func.count().over().label("total_count"))
+    # “下一页”带上一页末行的 (observed_at, id) 游标，避免深翻页时 OFFSET 逐行跳过；
+    # 直接指定页码或游标无效时仍按 OFFSET 分页
+    after = _decode_cursor(cursor)
+    if after is not None:
+        rows = session.execute(
+            data_stmt.where(tuple_(Reading.observed_at, Reading.id) < tuple_(*after))
+        ).all()
+        # 游标之后的窗口只覆盖剩余记录，前面几页按整页补回
+        skipped = (page - 1) * page_size
+    else:
+        rows = session.execute(data_stmt.offset((page - 1) * page_size)).all()
+        skipped = 0
+
+    if not conditions:
+        # 无筛选的首页最常见：总数取缓存的整表行数，数据查询可以直接沿索引取前几行
+        total = _TOTAL_ROWS_CACHE.get_or_load(
+            "readings", lambda: session.execute(_TOTAL_ROWS_STMT).scalar_one()
+        )
+    elif rows:
+        return rows, skipped + rows[0].total_count, page
+    else:
+        total = session.execute(_COUNT_STMT.where(*conditions)).scalar_one()
+
+    total_pages = max(1, math.ceil(total / page_size))
+    if not rows and total:
+        # 页码越界时退回到最后一页
+        page = total_pages
+        rows = session.execute(data_stmt.offset((page - 1) * page_size)).all()
+    return rows, total, min(page, total_pages)
+
+
 @app.get("/", response_class=HTMLResponse)
 def index(
     request: Request,
@@ -229,11 +407,12 @@ def index(
     non_null: bool = Query(False, description="只看非空"),
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(100, ge=10, le=500, description="每页数量"),
+    cursor: Optional[str] = Query(default=None, description="上一页最后一条记录的游标"),
 ):
     session = _open_session()
     try:
         provinces, basins = _collect_filter_options(session)
-        cities = _collect_cities(session, province)
+        cities = _collect_cities(session, provinces, province)
 
         start_dt = _parse_date(start_date, time.min)
         end_dt = _parse_date(end_date, time.max)
@@ -255,21 +434,9 @@ def index(
             non_null,
         )
 
-        count_stmt = select(func.count()).select_from(Reading).join(
-            Station, Reading.station_id == Station.id
-        )
-        for condition in conditions:
-            count_stmt = count_stmt.where(condition)
-        total = session.execute(count_stmt).scalar_one()
-
         page_size = page_size if page_size in PAGE_SIZE_OPTIONS else PAGE_SIZE_OPTIONS[1]
+        rows, total, page = _fetch_index_page(session, conditions, page, page_size, cursor)
         total_pages = max(1, math.ceil(total / page_size))
-        page = min(page, total_pages)
-        offset = (page - 1) * page_size
-
-        data_stmt = _base_select().where(*conditions).order_by(Reading.observed_at.desc())
-        data_stmt = data_stmt.offset(offset).limit(page_size)
-        rows = session.execute(data_stmt).all()
         prepared_rows = _prepare_rows(rows)
     finally:
         session.close()
@@ -291,8 +458,14 @@ def index(
     export_query = _build_query_params(base_params)
     prev_query = _build_query_params({**base_params, "page": page - 1}) if page > 1 else ""
     next_query = (
-        _build_query_params({**base_params, "page": page + 1})
-        if page < total_pages
+        _build_query_params(
+            {
+                **base_params,
+                "page": page + 1,
+                "cursor": _encode_cursor(rows[-1].observed_at, rows[-1].reading_id),
+            }
+        )
+        if page < total_pages and rows
         else ""
     )
 
@@ -336,43 +509,29 @@ def index(
 
 
 def _fetch_series(session: Session, conditions, metric: str):
+    # 数值转换与空值过滤都交给 SQLite，SERIES_LIMIT 只计有值的记录
+    value_expr = cast(func.json_extract(Reading.payload, f"$.{metric}"), Float)
     stmt = (
-        select(Reading.observed_at, Reading.payload)
+        select(Reading.observed_at, value_expr)
         .join(Station, Reading.station_id == Station.id)
-        .where(*conditions)
+        .where(*conditions, value_expr.isnot(None))
         .order_by(Reading.observed_at)
         .limit(SERIES_LIMIT)
     )
     rows = session.execute(stmt).all()
-    grouped: Dict[datetime, List[float]] = {}
-    for observed_at, payload_text in rows:
-        if not payload_text:
-            continue
-        try:
-            payload = json.loads(payload_text)
-        except json.JSONDecodeError:
-            continue
-        value = payload.get(metric)
-        if value is None:
-            continue
-        numeric_value = parse_numeric(str(value))
-        if numeric_value is None:
-            continue
-        grouped.setdefault(observed_at, []).append(numeric_value)
-
-    series = []
-    for timestamp in sorted(grouped.keys()):
-        values = grouped[timestamp]
-        if not values:
-            continue
-        avg = sum(values) / len(values)
-        series.append(
-            {
-                "time": timestamp.strftime("%Y-%m-%d %H:%M") if timestamp else "",
-                "value": round(avg, 3),
-            }
-        )
-    return series
+    if not rows:
+        return []
+    timestamps, values = zip(*rows)
+
+    # 同一时刻多个断面取均值：np.unique 分组，bincount 一次求和与计数
+    labels, inverse = np.unique(np.asarray(timestamps, dtype="datetime64[us]"), return_inverse=True)
+    sums = np.bincount(inverse, weights=np.asarray(values, dtype=float))
+    counts = np.bincount(inverse)
+    averages = np.round(sums / counts, 3).tolist()
+    return [
+        {"time": timestamp.isoformat(sep=" ", timespec="minutes"), "value": average}
+        for timestamp, average in zip(labels.tolist(), averages)
+    ]
 
 
 @app.get("/charts", response_class=HTMLResponse)
@@ -390,7 +549,7 @@ def charts(
     session = _open_session()
     try:
         provinces, basins = _collect_filter_options(session)
-        cities = _collect_cities(session, province)
+        cities = _collect_cities(session, provinces, province)
 
         start_dt = _parse_date(start_date, time.min)
         end_dt = _parse_date(end_date, time.max)
@@ -435,9 +594,9 @@ def charts(
             "min_value": "" if min_value is None else min_value,
             "max_value": "" if max_value is None else max_value,
             "non_null": non_null,
-            "class_distribution_json": json.dumps(class_distribution, ensure_ascii=False),
+            "class_distribution_json": orjson.dumps(class_distribution).decode("utf-8"),
             "distribution_total": distribution_total,
-            "series_data_json": json.dumps(series, ensure_ascii=False),
+            "series_data_json": orjson.dumps(series).decode("utf-8"),
             "active_tab": "charts",
         },
     )
@@ -457,59 +616,57 @@ def export_csv(
     max_value: Optional[str] = Query(default=None, description="最大值"),
     non_null: bool = Query(False, description="只看非空"),
 ):
-    session = _open_session()
-    try:
-        start_dt = _parse_date(start_date, time.min)
-        end_dt = _parse_date(end_date, time.max)
-
-        min_value_parsed = _parse_float(min_value)
-        max_value_parsed = _parse_float(max_value)
-
-        conditions = _build_conditions(
-            province,
-            basin,
-            city,
-            station_keyword,
-            water_quality_class,
-            start_dt,
-            end_dt,
-            metric_filter,
-            min_value_parsed,
-            max_value_parsed,
-            non_null,
-        )
-
-        stmt = (
-            _base_select()
-            .where(*conditions)
-            .order_by(Reading.observed_at.desc())
-            .limit(EXPORT_LIMIT)
-        )
-        rows = session.execute(stmt).all()
-        prepared_rows = _prepare_rows(rows)
-    finally:
-        session.close()
+    start_dt = _parse_date(start_date, time.min)
+    end_dt = _parse_date(end_date, time.max)
+
+    min_value_parsed = _parse_float(min_value)
+    max_value_parsed = _parse_float(max_value)
+
+    conditions = _build_conditions(
+        province,
+        basin,
+        city,
+        station_keyword,
+        water_quality_class,
+        start_dt,
+        end_dt,
+        metric_filter,
+        min_value_parsed,
+        max_value_parsed,
+        non_null,
+    )
 
-    output = io.StringIO()
-    writer = csv.writer(output)
-    header = ["省份", "城市", "流域", "断面名称", "监测时间"] + [label for _, label in DISPLAY_METRICS]
-    writer.writerow(header)
-    for row in prepared_rows:
-        row_values = [
-            row["province"],
-            row["city"],
-            row["basin"],
-            row["station_name"],
-            row["observed_at"],
-        ]
-        for key, _ in DISPLAY_METRICS:
-            row_values.append(row["metrics"].get(key))
-        writer.writerow(row_values)
-
-    output.seek(0)
+    stmt = (
+        _base_select()
+        .where(*conditions)
+        .order_by(Reading.observed_at.desc())
+        .limit(EXPORT_LIMIT)
+    )
     filename = "water_quality_export.csv"
     return StreamingResponse(
-        iter([output.getvalue()]),
+        _iter_export_csv(stmt),
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
+
+
+def _iter_export_csv(stmt: Select) -> Iterator[str]:
+    """Yield the export CSV in chunks of `EXPORT_BATCH_SIZE` rows while the cursor is read."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def _drain() -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+
+    header = ["省份", "城市", "流域", "断面名称", "监测时间"] + [label for _, label in DISPLAY_METRICS]
+    writer.writerow(header)
+    yield _drain()
+
+    with _open_session() as session:
+        result = session.execute(stmt).yield_per(EXPORT_BATCH_SIZE)
+        for partition in result.partitions():
+            writer.writerows(_prepare_rows_flat(partition))
+            yield _drain()